@@ -4,11 +4,16 @@ import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
 
-import requests
+import json
+import time
+import asyncio
+import hashlib
+import httpx
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from pydantic import BaseModel
-from fastapi.responses import JSONResponse, RedirectResponse, PlainTextResponse
-from db import execute_query
+from fastapi.responses import JSONResponse, RedirectResponse, PlainTextResponse, Response
+from db_async import execute_query_async, open_pool, close_pool, listen
 
 PROLIFIC_API_TOKEN = os.environ.get("PROLIFIC_API_TOKEN")
 PROLIFIC_API_BASE  = os.environ.get("PROLIFIC_API_BASE", "https://api.prolific.com")  # keep overridable
@@ -16,6 +21,12 @@ GROUP_CONTROL_ID   = os.environ.get("PROLIFIC_GROUP_CONTROL_ID")
 GROUP_TREATMENT_ID = os.environ.get("PROLIFIC_GROUP_TREATMENT_ID")
 PROLIFIC_DRY_RUN = False
 
+# Read-through cache for /api/get_goal_and_tasks (Qualtrics embeds hit it in bursts).
+# Entries are dropped early when db.py writes tasks (NOTIFY goal_tasks_changed).
+GOAL_CACHE_TTL = float(os.environ.get("GOAL_CACHE_TTL", "30"))
+GOAL_TASKS_CHANNEL = "goal_tasks_changed"
+_goal_cache = {}  # prolific_id -> (expires_at, goal_id, body, etag)
+
 # Base Qualtrics URL for the post-survey
 QUALTRICS_POST_BASE = os.environ.get(
     "QUALTRICS_POST_BASE",
@@ -27,9 +38,20 @@ class StatusUpdate(BaseModel):
     stage: str                # "presurvey" or "postsurvey"
     group: str | None = None  # "0" or "1" (only needed on presurvey)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Non-blocking data path: async Postgres pool + one shared async HTTP client
+    await open_pool()
+    app.state.http = httpx.AsyncClient(timeout=20)
+    listener = asyncio.create_task(listen(GOAL_TASKS_CHANNEL, _invalidate_goal_cache))
+    yield
+    listener.cancel()
+    await app.state.http.aclose()
+    await close_pool()
+
+app = FastAPI(lifespan=lifespan)
 
-def _add_to_prolific_group(prolific_pid: str, group_code: str) -> tuple[bool, str | None]:
+async def _add_to_prolific_group(prolific_pid: str, group_code: str) -> tuple[bool, str | None]:
     """
     Append a participant to the correct Prolific Participant Group.
     Idempotent: if already present, treat as success.
@@ -57,7 +79,7 @@ def _add_to_prolific_group(prolific_pid: str, group_code: str) -> tuple[bool, st
         return True, "dry_run"
     else:
         try:
-            r = requests.post(url, headers=headers, json=payload, timeout=20)
+            r = await app.state.http.post(url, headers=headers, json=payload)
             # Treat 200/201/204 as success; if API returns 409 for “already in group”, also consider success.
             if r.status_code in (200, 201, 202, 204):
                 return True, None
@@ -67,7 +89,7 @@ def _add_to_prolific_group(prolific_pid: str, group_code: str) -> tuple[bool, st
         except Exception as e:
             return False, str(e)
 
-def update_flag(prolific_id: str, stage: str, group: str | None = None) -> dict:
+async def update_flag(prolific_id: str, stage: str, group: str | None = None) -> dict:
     """
     - 'presurvey': mark presurvey complete, set Day-0 once, and (optionally) add to Prolific group.
     - 'postsurvey': mark postsurvey complete.
@@ -79,30 +101,30 @@ def update_flag(prolific_id: str, stage: str, group: str | None = None) -> dict:
            SET has_completed_presurvey = TRUE,
                onboarding_completed_at = COALESCE(onboarding_completed_at, NOW())
          WHERE prolific_code = %s
+        RETURNING 1
         """
         params = (prolific_id,)
     elif stage == "postsurvey":
-        sql = "UPDATE users SET has_completed_postsurvey = TRUE WHERE prolific_code = %s"
+        sql = "UPDATE users SET has_completed_postsurvey = TRUE WHERE prolific_code = %s RETURNING 1"
         params = (prolific_id,)
     else:
         return {"db_ok": False, "group_ok": False, "group_msg": "invalid stage"}
 
-    db_ok = True
-    try:
-        execute_query(sql, params, fetch=None, commit=True)
-    except Exception:
-        db_ok = False
+    # execute_query_async logs and swallows errors, so a row back is the
+    # only proof the flag was written (no row: DB error or unknown PID)
+    row = await execute_query_async(sql, params, fetch="one", commit=True)
+    db_ok = row is not None
 
     group_ok, group_msg = True, None
     if stage == "presurvey" and group is not None:
-        group_ok, group_msg = _add_to_prolific_group(prolific_id, group)
+        group_ok, group_msg = await _add_to_prolific_group(prolific_id, group)
 
     return {"db_ok": db_ok, "group_ok": group_ok, "group_msg": group_msg}
 
 
 # Fetch user_id and group from your users table by Prolific PID
-def _get_user_and_group_by_pid(pid: str):
-    row = execute_query(
+async def _get_user_and_group_by_pid(pid: str):
+    row = await execute_query_async(
         "SELECT user_id, group_assignment FROM users WHERE prolific_code = %s",
         (pid,),
         fetch="one"
@@ -124,7 +146,7 @@ async def go_postsurvey(req: Request):
         )
 
     # Look up user and group
-    user_id, group = _get_user_and_group_by_pid(pid)
+    user_id, group = await _get_user_and_group_by_pid(pid)
 
     # Handle missing records
     if not user_id or group not in {"0", "1"}:
@@ -142,43 +164,65 @@ async def go_postsurvey(req: Request):
 
 @app.post("/api/update_status")
 async def update_status(data: StatusUpdate):
-    result = update_flag(data.prolific_id, data.stage, data.group)
+    result = await update_flag(data.prolific_id, data.stage, data.group)
     return result
 
 @app.get("/api/update_status")
 async def update_status_get(prolific_id: str, stage: str, group: str | None = None):
-    result = update_flag(prolific_id, stage, group)
+    result = await update_flag(prolific_id, stage, group)
     return result
 
-@app.get("/api/get_goal_and_tasks")
-async def get_goal_and_tasks(prolific_id: str):
-    user_row = execute_query(
-        "SELECT user_id FROM users WHERE prolific_code = %s",
-        (prolific_id,),
-        fetch="one"
-    )
-    if not user_row:
-        return JSONResponse(content={"success": False, "error": "User not found"}, status_code=404)
-
-    user_id = user_row["user_id"]
-    goal_row = execute_query(
-        "SELECT id, goal_text FROM goals WHERE user_id = %s ORDER BY timestamp DESC LIMIT 1",
-        (user_id,),
-        fetch="one"
-    )
-    if not goal_row:
-        return JSONResponse(content={"success": False, "error": "Goal not found"}, status_code=404)
-
-    goal_id = goal_row["id"]
-    goal_text = goal_row["goal_text"]
-    tasks = execute_query(
-        "SELECT task_text, completed FROM tasks WHERE goal_id = %s AND status = 'active'",
-        (goal_id,),
-        fetch="all"
-    )
-    return {
-        "success": True,
-        "goal": goal_text,
-        "tasks": [{"task_text": t["task_text"], "completed": t["completed"]} for t in tasks],
-    }
+def _invalidate_goal_cache(goal_id: str):
+    """NOTIFY payload is the goal id whose tasks changed."""
+    for pid, entry in list(_goal_cache.items()):
+        if str(entry[1]) == goal_id:
+            _goal_cache.pop(pid, None)
+
+async def _load_goal_and_tasks(prolific_id: str):
+    # user, latest goal and its active tasks in one round-trip
+    return await execute_query_async("""
+        SELECT u.user_id,
+               g.id        AS goal_id,
+               g.goal_text,
+               COALESCE(
+                   (SELECT json_agg(json_build_object('task_text', t.task_text, 'completed', t.completed)
+                                    ORDER BY t.id)
+                      FROM tasks t
+                     WHERE t.goal_id = g.id AND t.status = 'active'),
+                   '[]'::json
+               ) AS tasks
+          FROM users u
+          LEFT JOIN LATERAL (
+                SELECT id, goal_text FROM goals
+                 WHERE user_id = u.user_id
+                 ORDER BY timestamp DESC
+                 LIMIT 1
+          ) g ON TRUE
+         WHERE u.prolific_code = %s
+         LIMIT 1
+    """, (prolific_id,), fetch="one")
 
+@app.get("/api/get_goal_and_tasks")
+async def get_goal_and_tasks(prolific_id: str, req: Request):
+    entry = _goal_cache.get(prolific_id)
+    if entry is None or entry[0] < time.monotonic():
+        row = await _load_goal_and_tasks(prolific_id)
+        if not row:
+            return JSONResponse(content={"success": False, "error": "User not found"}, status_code=404)
+        if row["goal_id"] is None:
+            return JSONResponse(content={"success": False, "error": "Goal not found"}, status_code=404)
+
+        body = json.dumps({
+            "success": True,
+            "goal": row["goal_text"],
+            "tasks": [{"task_text": t["task_text"], "completed": t["completed"]} for t in row["tasks"]],
+        })
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+        entry = (time.monotonic() + GOAL_CACHE_TTL, row["goal_id"], body, etag)
+        _goal_cache[prolific_id] = entry
+
+    _, _, body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [t.strip() for t in req.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,238 @@
+# bench_flows.py
+#
+# Headless latency benchmark for the three chat flows (goal setting, task
+# entry, weekly reflection). Each iteration creates a throwaway treatment-group
+# participant and clicks/types through the flows with Streamlit's AppTest,
+# timing every script run (one "step" = one user action incl. the reruns it
+# triggers) and counting DB and LLM round-trips.
+#
+# Meant to run against a scratch database and a recorded LLM session:
+#
+#   # 1) record once against the real endpoint
+#   LLM_RECORD_FILE=bench/llm.jsonl DATABASE_URL=... python bench/bench_flows.py -n 1
+#   # 2) replay offline as often as you like
+#   LLM_REPLAY_FILE=bench/llm.jsonl LLM_REPLAY_LATENCY=1.5 DATABASE_URL=... python bench/bench_flows.py -n 20
+#
+# The response cache is switched off by default here so every LLM call is
+# actually timed (set LLM_CACHE_ENABLED=true to benchmark with it).
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import argparse
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC)
+
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+from streamlit.testing.v1 import AppTest
+
+import db
+from llm_client import get_llm_client
+from llama_utils import LLM_API_URL
+
+APP = os.path.join(SRC, "streamlit_app.py")
+
+# What the fake participant types and which buttons they prefer, per flow.
+# "No" in goal setting walks into the LLM fix suggestions on purpose.
+FLOWS = {
+    "goal_setting": {
+        "step_key": "goal_step",
+        "answers": ["I want to get better at running"],
+        "prefer": ["No", "1"],
+    },
+    "add_tasks": {
+        "step_key": "task_entry_stage",
+        "answers": [
+            "Go for a 20 minute run on Tuesday",
+            "Look up a beginner 5k plan",
+            "Run 3km on Saturday morning",
+        ],
+        "prefer": ["✅ Yes, save task", "➕ Yes, add another"],
+    },
+    "reflection": {
+        "step_key": "reflection_step",
+        "answers": ["It went okay, work was busy but I still managed most of it."],
+        "prefer": ["✅ I'm ready"],
+    },
+}
+# Never click these: navigation away from the flow, dev tools, edit loops
+SKIP_BUTTONS = ("DEV", "Load earlier", "Main Menu", "Not now", "edit", "Edit", "Back to")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # nearest-rank
+    idx = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[idx]
+
+
+def llm_requests():
+    return get_llm_client(LLM_API_URL).stats["requests"]
+
+
+def state(at, key, default=None):
+    return at.session_state[key] if key in at.session_state else default
+
+
+def pick_button(at, prefer):
+    buttons = [b for b in at.main.button if not any(s in b.label for s in SKIP_BUTTONS)]
+    if not buttons:
+        return None
+    for label in prefer:
+        for b in buttons:
+            if b.label == label:
+                return b
+    return buttons[0]
+
+
+def drive_flow(at, flow, cfg, max_steps, timeout):
+    """Click/type through one flow until chat_state moves on or nothing is left to do."""
+    steps = []
+    answer_idx = 0
+    idle = 0
+    for _ in range(max_steps):
+        chat_state = state(at, "chat_state", "")
+        if not chat_state.startswith(flow.split("_")[0]):
+            break
+        label = f"{flow}:{state(at, cfg['step_key'])}"
+
+        if len(at.chat_input):
+            text = cfg["answers"][answer_idx % len(cfg["answers"])]
+            answer_idx += 1
+            action = at.chat_input[0].set_value(text)
+            label += " (type)"
+        else:
+            button = pick_button(at, cfg["prefer"])
+            if button is None:
+                idle += 1
+                if idle >= 2:
+                    break
+                action = at
+                label += " (wait)"
+            else:
+                idle = 0
+                action = button.click()
+                label += f" [{button.label}]"
+
+        db_before, llm_before = db.db_stats()["round_trips"], llm_requests()
+        start = time.perf_counter()
+        action.run(timeout=timeout)
+        elapsed = time.perf_counter() - start
+        steps.append({
+            "step": label,
+            "seconds": elapsed,
+            "db_round_trips": db.db_stats()["round_trips"] - db_before,
+            "llm_requests": llm_requests() - llm_before,
+        })
+        if at.exception:
+            steps[-1]["error"] = str(at.exception[0].value)
+            break
+    return steps
+
+
+def run_participant(flows, max_steps, timeout):
+    user_id = f"bench-{uuid.uuid4().hex[:12]}"
+    db.create_user(user_id, prolific_code=user_id, group="1", batch=-1)
+    db.mark_training_completed(user_id)
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    at.query_params["PROLIFIC_PID"] = user_id
+    at.session_state["user_id"] = user_id
+    at.session_state["authenticated"] = True
+    at.session_state["group"] = "treatment"
+    at.session_state["batch"] = -1
+
+    results = {}
+    for flow in flows:
+        if flow == "goal_setting":
+            at.session_state["chat_state"] = "goal_setting"
+            at.session_state["goal_step"] = "initial_goal"
+            at.session_state["message_index"] = 0
+        elif flow == "reflection":
+            at.session_state["chat_state"] = "reflection"
+            at.session_state["week"] = 1
+            at.session_state["session"] = "a"
+        start = time.perf_counter()
+        at.run(timeout=timeout)
+        steps = drive_flow(at, flow, FLOWS[flow], max_steps, timeout)
+        results[flow] = {"total_seconds": time.perf_counter() - start, "steps": steps}
+    return user_id, results
+
+
+def summarise(runs):
+    per_step = defaultdict(list)
+    per_flow = defaultdict(list)
+    totals = defaultdict(lambda: {"db_round_trips": 0, "llm_requests": 0, "errors": 0})
+    for results in runs:
+        for flow, res in results.items():
+            per_flow[flow].append(res["total_seconds"])
+            for s in res["steps"]:
+                per_step[s["step"]].append(s["seconds"])
+                totals[flow]["db_round_trips"] += s["db_round_trips"]
+                totals[flow]["llm_requests"] += s["llm_requests"]
+                totals[flow]["errors"] += "error" in s
+
+    report = {"flows": {}, "steps": {}}
+    for flow, times in per_flow.items():
+        report["flows"][flow] = {
+            "runs": len(times),
+            "p50": percentile(times, 50),
+            "p95": percentile(times, 95),
+            "db_round_trips_per_run": totals[flow]["db_round_trips"] / len(times),
+            "llm_requests_per_run": totals[flow]["llm_requests"] / len(times),
+            "errors": totals[flow]["errors"],
+        }
+    for step, times in per_step.items():
+        report["steps"][step] = {"n": len(times), "p50": percentile(times, 50), "p95": percentile(times, 95)}
+    return report
+
+
+def print_report(report):
+    print(f"\n{'flow':<16}{'runs':>6}{'p50 s':>9}{'p95 s':>9}{'db/run':>9}{'llm/run':>9}{'errors':>8}")
+    for flow, r in report["flows"].items():
+        print(f"{flow:<16}{r['runs']:>6}{r['p50']:>9.2f}{r['p95']:>9.2f}"
+              f"{r['db_round_trips_per_run']:>9.1f}{r['llm_requests_per_run']:>9.1f}{r['errors']:>8}")
+    print(f"\n{'step':<70}{'n':>5}{'p50 s':>9}{'p95 s':>9}")
+    for step, r in report["steps"].items():
+        print(f"{step[:69]:<70}{r['n']:>5}{r['p50']:>9.3f}{r['p95']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the goal / task / reflection flows headlessly.")
+    parser.add_argument("-n", "--iterations", type=int, default=5, help="participants to simulate")
+    parser.add_argument("--flows", default="goal_setting,add_tasks,reflection")
+    parser.add_argument("--max-steps", type=int, default=80, help="safety cap on actions per flow")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds per script run")
+    parser.add_argument("--json", help="also write the raw steps and the summary to this file")
+    args = parser.parse_args()
+
+    flows = [f.strip() for f in args.flows.split(",") if f.strip()]
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+
+    runs = []
+    for i in range(args.iterations):
+        user_id, results = run_participant(flows, args.max_steps, args.timeout)
+        print(f"[{i + 1}/{args.iterations}] {user_id}: "
+              + ", ".join(f"{f} {r['total_seconds']:.1f}s" for f, r in results.items()))
+        runs.append(results)
+
+    report = summarise(runs)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"summary": report, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
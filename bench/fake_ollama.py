@@ -0,0 +1,237 @@
+# fake_ollama.py
+#
+# Local stand-in for the Ollama /api/generate endpoint, for load testing the
+# real HTTP path (llm_client retries/timeouts, response cache, prefetch,
+# streaming) on a laptop without the RunPod GPU. FAKE_MODE can't do that since
+# it never leaves llama_utils.
+#
+#   python bench/fake_ollama.py --port 11434 --tokens-per-sec 30 --slots 2
+#   LLM_API_URL=http://127.0.0.1:11434/api/generate streamlit run src/streamlit_app.py
+#
+# It behaves like one GPU box: at most --slots generations run at once, the
+# rest queue (up to --queue, then 503). Timing is first-token latency plus
+# tokens / --tokens-per-sec. Errors can be injected per request:
+#   --error-rate  HTTP 500          --overload-rate  HTTP 503 (retryable)
+#   --hang-rate   never answers (hits the client read timeout)
+#   --drop-rate   streaming: connection cut mid-answer
+# GET /stats returns the counters as JSON.
+
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+VARIANT_WORDS = [
+    "each week", "for 30 minutes", "every morning", "by Friday", "three times this week",
+    "with a friend", "before work", "on weekends", "for two weeks", "step by step",
+]
+FEEDBACK = [
+    "Nice start, this goal is clear and focused!",
+    "Good goal, adding how often would make it easier to track.",
+    "Looks doable within two weeks, keep it up!",
+    "Great, this goal clearly matters to you!",
+    "Solid goal, a deadline would make it even stronger.",
+]
+
+
+def fake_completion(prompt):
+    """Deterministic, prompt-shaped answer: lists for suggestion prompts, a sentence for checks."""
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    goal = ""
+    if "[Goal]" in prompt:
+        goal = prompt.split("[Goal]", 1)[1].split("[/Goal]", 1)[0].strip()
+    elif "Goal:" in prompt:
+        goal = prompt.split("Goal:", 1)[1].strip().split("\n", 1)[0].strip()
+    goal = goal or "Work on my goal"
+    if "evaluating" in prompt or "RULE: Give one short" in prompt:
+        return rng.choice(FEEDBACK)
+    lines = [f"- {goal} {w}" for w in rng.sample(VARIANT_WORDS, 3)]
+    return "\n".join(lines) + "\n\nLet me know if you want more ideas."
+
+
+def tokenize(text):
+    # roughly one token per word incl. its trailing space
+    words = text.split(" ")
+    return [w + " " for w in words[:-1]] + [words[-1]]
+
+
+class Backend:
+    def __init__(self, args):
+        self.args = args
+        self.slots = threading.BoundedSemaphore(args.slots)
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.rng = random.Random(args.seed)
+        self.stats = {
+            "requests": 0, "completed": 0, "rejected_503": 0, "errors_500": 0,
+            "hung": 0, "dropped": 0, "max_queue": 0, "tokens": 0,
+        }
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.stats[name] += n
+
+    def roll(self, rate):
+        with self.lock:
+            return self.rng.random() < rate
+
+    def admit(self):
+        """Reserve a queue position; False if the queue is full."""
+        with self.lock:
+            if self.waiting >= self.args.slots + self.args.queue:
+                return False
+            self.waiting += 1
+            self.stats["max_queue"] = max(self.stats["max_queue"], self.waiting - self.args.slots)
+            return True
+
+    def leave(self):
+        with self.lock:
+            self.waiting -= 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real proxy
+    backend = None
+
+    def log_message(self, fmt, *args):
+        if not self.backend.args.quiet:
+            super().log_message(fmt, *args)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.backend.lock:
+                self._json(200, dict(self.backend.stats, in_system=self.backend.waiting))
+        elif self.path == "/api/tags":
+            self._json(200, {"models": [{"name": self.backend.args.model}]})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._json(400, {"error": "invalid JSON"})
+            return
+
+        b, args = self.backend, self.backend.args
+        b.count("requests")
+        if b.roll(args.overload_rate) or not b.admit():
+            b.count("rejected_503")
+            self._json(503, {"error": "server busy"})
+            return
+        try:
+            with b.slots:
+                if b.roll(args.error_rate):
+                    b.count("errors_500")
+                    self._json(500, {"error": "injected failure"})
+                    return
+                if b.roll(args.hang_rate):
+                    b.count("hung")
+                    time.sleep(args.hang_seconds)
+                    self.close_connection = True
+                    return
+                self._generate(payload)
+        finally:
+            b.leave()
+
+    def _generate(self, payload):
+        b, args = self.backend, self.backend.args
+        text = fake_completion(payload.get("prompt", ""))
+        for stop in payload.get("stop") or []:
+            idx = text.find(stop)
+            if idx != -1:
+                text = text[:idx]
+        max_tokens = payload.get("max_tokens") or (payload.get("options") or {}).get("num_predict") or 256
+        tokens = tokenize(text)[:max_tokens]
+        per_token = 1.0 / args.tokens_per_sec
+
+        time.sleep(args.first_token_ms / 1000.0)
+        if not payload.get("stream", True):
+            time.sleep(per_token * len(tokens))
+            b.count("tokens", len(tokens))
+            b.count("completed")
+            self._json(200, self._chunk("".join(tokens), done=True, eval_count=len(tokens)))
+            return
+
+        drop = b.roll(args.drop_rate)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, tok in enumerate(tokens):
+                if drop and i == len(tokens) // 2:
+                    b.count("dropped")
+                    self.close_connection = True
+                    return
+                time.sleep(per_token)
+                self._write_chunk(self._chunk(tok, done=False))
+                b.count("tokens")
+            self._write_chunk(self._chunk("", done=True, eval_count=len(tokens)))
+            self.wfile.write(b"0\r\n\r\n")
+            b.count("completed")
+        except (BrokenPipeError, ConnectionResetError):
+            # client closed the stream early (cut at stop / 3 variants)
+            self.close_connection = True
+
+    def _chunk(self, text, done, eval_count=None):
+        chunk = {"model": self.backend.args.model, "response": text, "done": done}
+        if done:
+            chunk["eval_count"] = eval_count
+        return chunk
+
+    def _write_chunk(self, obj):
+        data = (json.dumps(obj) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _json(self, status, obj):
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama-compatible /api/generate stand-in for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", default="mistral")
+    parser.add_argument("--slots", type=int, default=1, help="generations running at once (GPU parallelism)")
+    parser.add_argument("--queue", type=int, default=64, help="requests allowed to wait before 503")
+    parser.add_argument("--tokens-per-sec", type=float, default=30.0)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--overload-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    Handler.backend = Backend(args)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f"fake ollama on http://{args.host}:{args.port}/api/generate "
+          f"({args.slots} slot(s), {args.tokens_per_sec:g} tok/s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# load_llm.py
+#
+# Concurrency load test for the LLM path in llama_utils (client pool, retries,
+# timeouts, response cache, prefetch pool). Start bench/fake_ollama.py first and
+# point LLM_API_URL at it:
+#
+#   python bench/fake_ollama.py --slots 2 --tokens-per-sec 40 --overload-rate 0.05 --quiet &
+#   LLM_API_URL=http://127.0.0.1:11434/api/generate python bench/load_llm.py --users 30
+#
+# Every virtual participant does what goal setting does: the five SMART checks
+# in parallel, one fix suggestion and one task suggestion.
+
+import os
+import sys
+import time
+import math
+import random
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import llama_utils
+from llama_utils import (
+    SMART_DIMENSIONS, SUGGEST_FIX, check_smart_feedback, suggest_tasks_for_goal,
+    fake_response, llm_stats,
+)
+
+GOALS = [
+    "Learn Spanish", "Exercise more", "Finish my online course", "Read more books",
+    "Get better at running", "Eat healthier", "Sleep earlier", "Learn to cook",
+    "Save money", "Practice guitar",
+]
+
+_lock = threading.Lock()
+_latencies = defaultdict(list)
+_fallbacks = defaultdict(int)
+
+
+def timed(kind, fallback, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _latencies[kind].append(elapsed)
+        if result.strip() == fallback.strip():
+            _fallbacks[kind] += 1
+    return result
+
+
+def participant(rng, unique_goals):
+    goal = rng.choice(GOALS)
+    if unique_goals:
+        goal = f"{goal} {rng.randint(0, 10**6)}"
+    with ThreadPoolExecutor(max_workers=len(SMART_DIMENSIONS)) as pool:
+        checks = [
+            pool.submit(timed, "check", fake_response(goal, f"check_{d}"), check_smart_feedback, goal, d)
+            for d in SMART_DIMENSIONS
+        ]
+        for f in checks:
+            f.result()
+    dim = rng.choice(SMART_DIMENSIONS)
+    timed("fix", fake_response(goal, dim), SUGGEST_FIX[dim], goal)
+    timed("tasks", fake_response(goal, "tasks"), suggest_tasks_for_goal, goal, [])
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load on the llama_utils LLM path.")
+    parser.add_argument("--users", type=int, default=20, help="participants in total")
+    parser.add_argument("--concurrency", type=int, default=10, help="participants at the same time")
+    parser.add_argument("--ramp", type=float, default=0.0, help="seconds between participant starts")
+    parser.add_argument("--unique-goals", action="store_true", help="defeat the response cache")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("LLM_API_URL:", llama_utils.LLM_API_URL)
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = []
+        for _ in range(args.users):
+            futures.append(pool.submit(participant, random.Random(rng.random()), args.unique_goals))
+            if args.ramp:
+                time.sleep(args.ramp)
+        for f in futures:
+            f.result()
+    wall = time.perf_counter() - start
+
+    print(f"\n{args.users} participants in {wall:.1f}s (concurrency {args.concurrency})")
+    print(f"{'call':<8}{'n':>6}{'p50 s':>9}{'p95 s':>9}{'max s':>9}{'fallback':>10}")
+    for kind, values in _latencies.items():
+        print(f"{kind:<8}{len(values):>6}{percentile(values, 50):>9.2f}{percentile(values, 95):>9.2f}"
+              f"{max(values):>9.2f}{_fallbacks[kind]:>10}")
+    print("\nllm_stats:", llm_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 # chat_thread.py
 
 from datetime import datetime, timezone
-from db import save_message_to_db
+from chat_writer import get_chat_writer
 import streamlit as st
 
 class ChatThread(list):
@@ -38,7 +38,8 @@ class ChatThread(list):
 
         if not should_skip:
             # Persist into the database with the mapped sender
-            save_message_to_db(
+            # (sync or write-behind, depending on CHAT_WRITE_MODE)
+            get_chat_writer().enqueue(
                 self.user_id,
                 db_sender,
                 entry["message"],
@@ -59,4 +60,18 @@ class ChatThread(list):
 
     def __iadd__(self, entries):
         self.extend(entries)
-        return self
\ No newline at end of file
+        return self
+
+
+def stream_preview():
+    """
+    Placeholder under the chat that shows an LLM answer while it streams in.
+    Returns (on_partial, clear): pass on_partial to the llama_utils suggesters,
+    call clear() once the final message has been appended to the thread.
+    """
+    slot = st.empty()
+
+    def on_partial(text):
+        slot.markdown(f"✍️ {text}", unsafe_allow_html=True)
+
+    return on_partial, slot.empty
@@ -0,0 +1,54 @@
+# chat_view.py
+#
+# Chat transcript as a bidirectional custom component. The browser keeps the
+# rendered message list between reruns, so each rerun only ships the messages
+# appended since `last_rendered_index` instead of rebuilding the whole HTML.
+
+import os
+import hashlib
+import streamlit as st
+import streamlit.components.v1 as components
+
+_chat_component = components.declare_component(
+    "chat_view",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_component"),
+)
+
+
+def _fingerprint(m):
+    return hashlib.sha1(f'{m["sender"]}\0{m["message"]}'.encode("utf-8")).hexdigest()
+
+
+def render_chat(messages, height=480, key="chat_view"):
+    """
+    Render the chat thread, sending the component only what it doesn't have.
+    Handles the three ways the list can change between reruns:
+      - messages appended           -> send the new ones
+      - last bubble swapped         -> placeholder popped + answer appended, resend from it
+      - thread replaced / shortened -> resend everything
+    st.session_state["chat_view_reset"] = True forces a full resend (e.g. after
+    older messages were prepended).
+    """
+    rendered = st.session_state.get("last_rendered_index", 0)
+    tail = st.session_state.get("last_rendered_tail")
+    n = len(messages)
+
+    # The browser reports how many bubbles it still has when its iframe was remounted
+    ack = st.session_state.get(key)
+    if isinstance(ack, dict) and ack.get("nonce") != st.session_state.get("chat_view_ack_seen"):
+        st.session_state["chat_view_ack_seen"] = ack.get("nonce")
+        rendered = min(rendered, int(ack.get("have", 0)))
+        tail = _fingerprint(messages[rendered - 1]) if 0 < rendered <= n else None
+
+    if st.session_state.pop("chat_view_reset", False) or rendered > n:
+        start = 0
+    elif rendered > 0 and _fingerprint(messages[rendered - 1]) != tail:
+        start = rendered - 1
+    else:
+        start = rendered
+
+    new = [{"sender": m["sender"], "message": m["message"]} for m in messages[start:]]
+    _chat_component(start=start, messages=new, height=height, key=key, default=None)
+
+    st.session_state["last_rendered_index"] = n
+    st.session_state["last_rendered_tail"] = _fingerprint(messages[-1]) if n else None
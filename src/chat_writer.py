@@ -0,0 +1,163 @@
+# chat_writer.py
+#
+# Write-behind persistence for chat bubbles. ChatThread.append() hands rows to
+# the process-wide ChatWriter instead of committing each bubble on the spot.
+#
+# CHAT_WRITE_MODE:
+#   sync                - old behaviour, one INSERT + commit per bubble
+#   flush_before_rerun  - rows are queued, and the app flushes them at the end of
+#                         every script run, so nothing is pending once the page
+#                         has re-rendered (never drops)
+#   best_effort         - rows are written by the background flusher only; when
+#                         the queue is full new rows are dropped and counted
+#
+# stats(): "written" only counts rows the DB confirmed, rows whose INSERT
+# failed are counted as "failed", rows never attempted (queue full) as "dropped".
+
+import os
+import queue
+import atexit
+import threading
+
+from db import save_message_to_db, save_messages_to_db
+from logger import setup_logger
+
+logger = setup_logger()
+
+CHAT_WRITE_MODE = os.environ.get("CHAT_WRITE_MODE", "sync").strip().lower()
+CHAT_QUEUE_MAX = int(os.environ.get("CHAT_QUEUE_MAX", "1000"))
+CHAT_FLUSH_BATCH = int(os.environ.get("CHAT_FLUSH_BATCH", "50"))
+CHAT_FLUSH_INTERVAL = float(os.environ.get("CHAT_FLUSH_INTERVAL", "0.5"))
+
+WRITE_MODES = ("sync", "flush_before_rerun", "best_effort")
+
+
+class ChatWriter:
+    def __init__(self, mode="sync", max_queue=1000, batch_size=50, flush_interval=0.5):
+        if mode not in WRITE_MODES:
+            logger.warning("Unknown CHAT_WRITE_MODE %r, falling back to 'sync'", mode)
+            mode = "sync"
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        # counters (updated from session threads and the flusher thread)
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def enqueue(self, user_id, sender, message, timestamp, phase=None):
+        if self.mode == "sync":
+            if save_message_to_db(user_id, sender, message, timestamp, phase=phase):
+                self._count("written")
+            else:
+                self._count("failed")
+            return
+
+        self._ensure_thread()
+        row = (user_id, sender, message, timestamp, phase)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            if self.mode == "best_effort":
+                self._count("dropped")
+                logger.warning("Chat write queue full, dropped message | user_id=%s", user_id)
+                return
+            # flush_before_rerun never drops: make room synchronously
+            self.flush()
+            self._queue.put(row)
+        self._count("enqueued")
+
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything queued so far. Blocks until done."""
+        with self._write_lock:
+            while True:
+                rows = self._drain(self.batch_size)
+                if not rows:
+                    return
+                self._write(rows)
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "queue_depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def _drain(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows):
+        written = save_messages_to_db(rows)
+        self._count("flushes")
+        self._count("written", written)
+        if written < len(rows):
+            self._count("failed", len(rows) - written)
+            logger.error("Chat batch insert failed, %s message(s) lost", len(rows) - written)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Chat writer flush failed")
+
+
+_writer = ChatWriter(
+    mode=CHAT_WRITE_MODE,
+    max_queue=CHAT_QUEUE_MAX,
+    batch_size=CHAT_FLUSH_BATCH,
+    flush_interval=CHAT_FLUSH_INTERVAL,
+)
+# Session end for the whole process: don't lose what's still queued
+atexit.register(_writer.flush)
+
+
+def get_chat_writer():
+    return _writer
+
+
+def flush_chat_writes():
+    """Called by the app at the end of each script run (flush_before_rerun durability)."""
+    if _writer.mode == "flush_before_rerun":
+        _writer.flush()
+
+
+def chat_writer_stats():
+    return _writer.stats()
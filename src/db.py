@@ -1,8 +1,14 @@
 # db.py
 
 import os
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.pool
+from psycopg2.extras import RealDictCursor, execute_values
 from logger import setup_logger
 
 import json
@@ -14,43 +20,313 @@ DATABASE_URL = os.environ.get("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set")
 
-# conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+# Pool sizing is per process (one Streamlit server or one uvicorn worker).
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+# Connections idle for longer than this get a "SELECT 1" before being reused.
+DB_POOL_HEALTHCHECK_SECONDS = float(os.environ.get("DB_POOL_HEALTHCHECK_SECONDS", "30"))
+# How long a caller waits for a free connection before giving up.
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises instead of blocking when exhausted, so gate checkouts
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_last_used = {}  # id(conn) -> time.monotonic() of last checkin
+# Connection of the unit of work open on this thread (see transaction())
+_tx = threading.local()
+
+# Per-rerun read cache: identical SELECTs issued during one Streamlit script
+# run are answered from memory. Any write in this process bumps the generation,
+# which invalidates every cached read.
+DB_RUN_CACHE = os.environ.get("DB_RUN_CACHE", "1") == "1"
+_run_cache = threading.local()
+_write_gen = 0
+_write_gen_lock = threading.Lock()
+
+# Round-trip counter (benchmarks / monitoring)
+_db_stats = {"round_trips": 0}
+_db_stats_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None or _pool.closed:
+        with _pool_lock:
+            if _pool is None or _pool.closed:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    DATABASE_URL,
+                    cursor_factory=RealDictCursor,
+                    # TCP keepalives so idle pooled connections aren't silently dropped by the proxy
+                    keepalives=1,
+                    keepalives_idle=30,
+                    keepalives_interval=10,
+                    keepalives_count=3,
+                )
+                logger.info("DB pool created | min=%s max=%s", DB_POOL_MIN, DB_POOL_MAX)
+    return _pool
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    idle = time.monotonic() - _last_used.get(id(conn), 0)
+    if idle < DB_POOL_HEALTHCHECK_SECONDS:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout():
+    if not _pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise psycopg2.pool.PoolError("Timed out waiting for a pooled DB connection")
+    try:
+        pool = _get_pool()
+        conn = pool.getconn()
+        if not _is_healthy(conn):
+            logger.warning("Discarding broken pooled DB connection, reconnecting")
+            _last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        return conn
+    except BaseException:
+        _pool_slots.release()
+        raise
+
+
+def _checkin(conn):
+    pool = _pool
+    try:
+        if pool is None or pool.closed:
+            # pool was shut down while this connection was out
+            conn.close()
+        elif conn.closed:
+            _last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+        else:
+            _last_used[id(conn)] = time.monotonic()
+            pool.putconn(conn)
+    finally:
+        _pool_slots.release()
+
+
+@contextmanager
+def get_connection():
+    """
+    Borrow a connection from the process-wide pool.
+    Commits on success and rolls back on error (same as `with psycopg2.connect()`),
+    then hands the connection back to the pool. Connections that died mid-use are
+    closed instead of being returned.
+    """
+    conn = _checkout()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        _checkin(conn)
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
+        _last_used.clear()
+
+
+@contextmanager
+def transaction():
+    """
+    Unit of work: every execute_query / execute_many call made inside the block
+    (including the helpers below) runs on one connection and is committed once
+    at the end. Any failure rolls the whole block back and is re-raised.
+    Nested transaction() blocks join the outer one.
+    """
+    if getattr(_tx, "conn", None) is not None:
+        yield _tx.conn
+        return
+    try:
+        with get_connection() as conn:
+            _tx.conn = conn
+            try:
+                yield conn
+            finally:
+                _tx.conn = None
+    finally:
+        _bump_write_gen()
+
+
+def begin_run_cache():
+    """
+    Start a fresh read cache for the current thread (call once at the top of
+    every Streamlit script run). Threads that never call this don't cache.
+    """
+    _run_cache.store = {} if DB_RUN_CACHE else None
+    _run_cache.hits = 0
+    _run_cache.misses = 0
+
+
+def run_cache_stats():
+    return {
+        "hits": getattr(_run_cache, "hits", 0),
+        "misses": getattr(_run_cache, "misses", 0),
+    }
+
+
+def _bump_write_gen():
+    global _write_gen
+    with _write_gen_lock:
+        _write_gen += 1
+
+
+def _is_read(query):
+    return query.lstrip().upper().startswith("SELECT")
+
+
+def _cache_key(query, fetch, params):
+    # dict params: key on the items, tuple(dict) would only be the names
+    if isinstance(params, dict):
+        return (query, fetch, tuple(sorted(params.items())))
+    if isinstance(params, (tuple, list)):
+        return (query, fetch, tuple(params))
+    return None
+
+
+def _copy_result(result):
+    # hand out copies so callers mutating a row/list can't poison the cache
+    if isinstance(result, list):
+        return [dict(r) for r in result]
+    if isinstance(result, dict):
+        return dict(result)
+    return result
+
+
+def _run(conn, query, params, fetch, commit):
+    with conn.cursor() as cursor:
+        cursor.execute(query, params)
+        if commit:
+            conn.commit()
+        if fetch == "one":
+            return cursor.fetchone()
+        elif fetch == "all":
+            return cursor.fetchall()
+        else:
+            return None
+
+
+def _run_values(conn, query, rows, template, fetch, commit):
+    with conn.cursor() as cursor:
+        result = execute_values(cursor, query, rows, template=template, page_size=500, fetch=fetch == "all")
+        if commit:
+            conn.commit()
+        return result if fetch == "all" else None
+
+
+def db_stats():
+    with _db_stats_lock:
+        return dict(_db_stats)
+
+
+def _count_round_trip():
+    with _db_stats_lock:
+        _db_stats["round_trips"] += 1
+
+
+def _run_on_pool(fn, query, params, fetch, commit):
+    _count_round_trip()
+    tx_conn = getattr(_tx, "conn", None)
+    if tx_conn is not None:
+        # Inside a unit of work: defer the commit and let errors abort the whole block
+        try:
+            return fn(tx_conn, query, params, fetch, False)
+        except Exception:
+            logger.exception("Database query failed in transaction | SQL: %s | Params: %s", query, params)
+            raise
+
+    for attempt in (1, 2):
+        conn = None
+        try:
+            conn = _checkout()
+            result = fn(conn, query, params, fetch, commit)
+            conn.commit()
+            return result
+        except Exception as e:
+            lost = conn is not None and bool(conn.closed)
+            if conn is not None and not lost:
+                conn.rollback()
+            if lost and attempt == 1:
+                # Pooled connection died under us (server restart, proxy idle timeout):
+                # retry once on a fresh connection.
+                logger.warning("DB connection lost, retrying once on a fresh connection")
+                continue
+            print("Database error:", e)
+            logger.exception("Database query failed | SQL: %s | Params: %s", query, params)
+            return None if fetch == "one" else []
+        finally:
+            if conn is not None:
+                _checkin(conn)
 
 
 def execute_query(query, params=(), fetch="one", commit=False):
+    if commit or not _is_read(query):
+        try:
+            return _run_on_pool(_run, query, params, fetch, commit)
+        finally:
+            _bump_write_gen()
+
+    store = getattr(_run_cache, "store", None)
+    if store is None or fetch is None or getattr(_tx, "conn", None) is not None:
+        return _run_on_pool(_run, query, params, fetch, commit)
+
     try:
-        with psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor) as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(query, params)
-                if commit:
-                    conn.commit()
-                if fetch == "one":
-                    return cursor.fetchone()
-                elif fetch == "all":
-                    return cursor.fetchall()
-                else:
-                    return None
-    except Exception as e:
-        print("Database error:", e)
-        logger.exception("Database query failed | SQL: %s | Params: %s", query, params)
-        # context manager will rollback automatically on exception
-        return None if fetch == "one" else []
-
-    # try:
-    #     with conn.cursor() as cursor:
-    #         cursor.execute(query, params)
-    #         if commit:
-    #             conn.commit()
-    #         if fetch == "one":
-    #             return cursor.fetchone()
-    #         elif fetch == "all":
-    #             return cursor.fetchall()
-    #         else:
-    #             return None
-    # except Exception as e:
-    #     print("Database error:", e)
-    #     conn.rollback()
-    #     return None if fetch == "one" else []
+        key = _cache_key(query, fetch, params)
+        cached = store.get(key) if key is not None else None
+    except TypeError:  # unhashable / unsortable params (lists etc.) -> just don't cache
+        key = None
+    if key is None:
+        return _run_on_pool(_run, query, params, fetch, commit)
+    if cached is not None and cached[0] == _write_gen:
+        _run_cache.hits += 1
+        return _copy_result(cached[1])
+
+    _run_cache.misses += 1
+    gen = _write_gen
+
+    def run_and_remember(conn, q, p, f, c):
+        # only reached on success, so swallowed DB errors are never cached
+        result = _run(conn, q, p, f, c)
+        store[key] = (gen, _copy_result(result))
+        return result
+
+    return _run_on_pool(run_and_remember, query, params, fetch, commit)
+
+
+def execute_many(query, rows, template=None, fetch=None, commit=False):
+    """
+    Multi-row insert in one round-trip via psycopg2's execute_values.
+    `query` must contain a single `VALUES %s` placeholder; `rows` is a list of tuples.
+    """
+    if not rows:
+        return [] if fetch == "all" else None
+    try:
+        return _run_on_pool(
+            lambda conn, q, r, f, c: _run_values(conn, q, r, template, f, c),
+            query, rows, fetch, commit
+        )
+    finally:
+        _bump_write_gen()
 
 
 # -------------------------------
@@ -106,15 +382,36 @@ def update_user_phase(user_id, new_phase):
 
 
 def save_message_to_db(user_id, sender, message, timestamp, phase=None):
-    execute_query(
+    """Insert one chat_history row. Returns True if it was written."""
+    row = execute_query(
         """
         INSERT INTO chat_history (user_id, sender, message, timestamp, phase)
         VALUES (%s, %s, %s, %s, %s)
+        RETURNING 1
         """,
         (user_id, sender, message, timestamp, phase),
-        fetch=None,
+        fetch="one",
+        commit=True
+    )
+    return row is not None
+
+
+def save_messages_to_db(rows):
+    """
+    Batch insert of chat_history rows, each a (user_id, sender, message, timestamp, phase) tuple.
+    Returns how many rows were written (0 if the insert failed).
+    """
+    written = execute_many(
+        """
+        INSERT INTO chat_history (user_id, sender, message, timestamp, phase)
+        VALUES %s
+        RETURNING 1
+        """,
+        rows,
+        fetch="all",
         commit=True
     )
+    return len(written or [])
 
 
 def get_chat_history(user_id, phase):
@@ -130,6 +427,36 @@ def get_chat_history(user_id, phase):
 
 
 
+def get_chat_history_page(user_id, phase, limit=30, before=None):
+    """
+    Keyset page of a phase's chat: the newest `limit` messages older than
+    `before` (the (timestamp, id) of a previous page's first row), returned
+    oldest first. Ordered by (timestamp, id) so messages sharing a timestamp
+    are neither skipped nor reordered between pages.
+    Served by the (user_id, phase, timestamp, id) index.
+    """
+    if before is None:
+        rows = execute_query("""
+            SELECT id, sender, message, timestamp
+              FROM chat_history
+             WHERE user_id = %s
+               AND phase = %s
+          ORDER BY timestamp DESC, id DESC
+             LIMIT %s
+        """, (user_id, phase, limit), fetch="all")
+    else:
+        rows = execute_query("""
+            SELECT id, sender, message, timestamp
+              FROM chat_history
+             WHERE user_id = %s
+               AND phase = %s
+               AND (timestamp, id) < (%s, %s)
+          ORDER BY timestamp DESC, id DESC
+             LIMIT %s
+        """, (user_id, phase, before[0], before[1], limit), fetch="all")
+    return list(reversed(rows))
+
+
 def save_goal(user_id, goal_text):
     row = execute_query("""
         INSERT INTO goals (user_id, goal_text)
@@ -140,8 +467,9 @@ def save_goal(user_id, goal_text):
 
 
 def get_goals(user_id):
+    # newest first, same order as get_session_bootstrap()["goals"]
     return execute_query(
-        "SELECT id, goal_text FROM goals WHERE user_id = %s",
+        "SELECT id, goal_text FROM goals WHERE user_id = %s ORDER BY timestamp DESC, id DESC",
         (user_id,), fetch="all"
     )
 
@@ -149,11 +477,19 @@ def get_goal_duration_status(goal_id):
     row = execute_query("SELECT duration_status FROM goals WHERE id = %s", (goal_id,))
     return row["duration_status"] if row else None
 
+# Task writes NOTIFY this channel with the goal id so api.py can drop its
+# cached /api/get_goal_and_tasks response (delivered on commit).
+GOAL_TASKS_CHANNEL = "goal_tasks_changed"
+
 def save_task(goal_id, task_text):
     execute_query("""
-        INSERT INTO tasks (goal_id, task_text, status)
-        VALUES (%s, %s, 'active')
-    """, (goal_id, task_text),fetch=None, commit=True)
+        WITH ins AS (
+            INSERT INTO tasks (goal_id, task_text, status)
+            VALUES (%s, %s, 'active')
+            RETURNING goal_id
+        )
+        SELECT pg_notify(%s, goal_id::text) FROM ins
+    """, (goal_id, task_text, GOAL_TASKS_CHANNEL),fetch=None, commit=True)
 
 def get_tasks(goal_id, active_only=True):
     query = """
@@ -167,8 +503,12 @@ def get_tasks(goal_id, active_only=True):
 
 def update_task_completion(task_id, completed):
     execute_query("""
-        UPDATE tasks SET completed = %s WHERE id = %s
-    """, (completed, task_id), fetch=None, commit=True)
+        WITH upd AS (
+            UPDATE tasks SET completed = %s WHERE id = %s
+            RETURNING goal_id
+        )
+        SELECT pg_notify(%s, goal_id::text) FROM upd
+    """, (completed, task_id, GOAL_TASKS_CHANNEL), fetch=None, commit=True)
 
 
 def save_reflection(user_id, goal_id, content, week_number, session_id="a"):
@@ -191,6 +531,26 @@ def save_reflection_response(reflection_id, task_id=None, progress_rating=None,
     ),fetch=None,  commit=True)
 
 
+def save_reflection_responses(reflection_id, responses):
+    """
+    Insert all responses of one reflection as a single multi-row INSERT.
+    `responses` is a list of dicts with the keyword arguments of save_reflection_response.
+    """
+    rows = [
+        (
+            reflection_id, r.get("task_id"), r.get("progress_rating"), r.get("update_type"),
+            r.get("updated_task_text"), r.get("answer_key"), r.get("answer_text")
+        )
+        for r in responses
+    ]
+    execute_many("""
+        INSERT INTO reflection_responses (
+            reflection_id, task_id, progress_rating, update_type, updated_task_text, answer_key, answer_text
+        )
+        VALUES %s
+    """, rows, fetch=None, commit=True)
+
+
 def get_reflections(user_id):
     return execute_query("""
         SELECT goal_id, reflection_text, week_number FROM reflections
@@ -239,12 +599,16 @@ def get_goals_with_task_counts(user_id):
 
 def archive_task(task_id, replaced_by_task_id=None, reason=None):
     execute_query("""
-        UPDATE tasks
-        SET status = 'archived',
-            replaced_by_task_id = %s,
-            replacement_reason = %s
-        WHERE id = %s
-    """, (replaced_by_task_id, reason, task_id), fetch=None, commit=True)
+        WITH upd AS (
+            UPDATE tasks
+            SET status = 'archived',
+                replaced_by_task_id = %s,
+                replacement_reason = %s
+            WHERE id = %s
+            RETURNING goal_id
+        )
+        SELECT pg_notify(%s, goal_id::text) FROM upd
+    """, (replaced_by_task_id, reason, task_id, GOAL_TASKS_CHANNEL), fetch=None, commit=True)
 
 def replace_or_modify_task(goal_id, old_task_id, new_task_text, reason="Modified"):
     """
@@ -259,10 +623,15 @@ def replace_or_modify_task(goal_id, old_task_id, new_task_text, reason="Modified
         commit=True
         )
         
-    # 2️⃣ Insert the new, active task
+    # 2️⃣ Insert the new, active task (and tell api.py the goal's tasks changed)
     row = execute_query(
-        "INSERT INTO tasks (goal_id, task_text, status) VALUES (%s, %s, 'active') RETURNING id",
-        (goal_id, new_task_text),
+        """
+        WITH ins AS (
+            INSERT INTO tasks (goal_id, task_text, status) VALUES (%s, %s, 'active') RETURNING id, goal_id
+        )
+        SELECT id, pg_notify(%s, goal_id::text) FROM ins
+        """,
+        (goal_id, new_task_text, GOAL_TASKS_CHANNEL),
         fetch="one",
         commit=True
         )
@@ -339,6 +708,82 @@ def get_reflection_responses(reflection_id):
         fetch="all",
     )
 
+def get_goal_overview(user_id):
+    """
+    What the menu and the goal view show, aggregated in one query:
+      has_completed_training
+      goal             latest goal {id, goal_text, task_count, tasks: [{id, task_text, completed}]}
+                       (active tasks only), or None if the user has no goal
+      last_reflection  {id, week_number, session_id, done, total} for that goal, or None;
+                       total = task progress rows, done = those rated 4 (fully done)
+      goal_without_tasks  newest goal (any, not just the latest) with no active task
+                       {id, goal_text}, or None
+    """
+    row = execute_query("""
+        SELECT u.has_completed_training,
+               g.id AS goal_id, g.goal_text,
+               COALESCE(t.tasks, '[]'::json) AS tasks, t.task_count,
+               r.id AS reflection_id, r.week_number, r.session_id,
+               rr.done, rr.total,
+               e.id AS empty_goal_id, e.goal_text AS empty_goal_text
+          FROM users u
+          LEFT JOIN LATERAL (
+                SELECT id, goal_text FROM goals
+                 WHERE user_id = u.user_id
+                 ORDER BY timestamp DESC, id DESC
+                 LIMIT 1
+          ) g ON TRUE
+          LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object('id', id, 'task_text', task_text, 'completed', completed) ORDER BY id) AS tasks,
+                       COUNT(*) AS task_count
+                  FROM tasks
+                 WHERE goal_id = g.id AND status = 'active'
+          ) t ON TRUE
+          LEFT JOIN LATERAL (
+                SELECT id, week_number, session_id FROM reflections
+                 WHERE user_id = u.user_id AND goal_id = g.id
+                 ORDER BY week_number DESC, session_id DESC, id DESC
+                 LIMIT 1
+          ) r ON TRUE
+          LEFT JOIN LATERAL (
+                SELECT COUNT(task_id) FILTER (WHERE progress_rating = 4) AS done,
+                       COUNT(task_id) AS total
+                  FROM reflection_responses
+                 WHERE reflection_id = r.id
+          ) rr ON TRUE
+          LEFT JOIN LATERAL (
+                SELECT eg.id, eg.goal_text FROM goals eg
+                 WHERE eg.user_id = u.user_id
+                   AND NOT EXISTS (SELECT 1 FROM tasks et WHERE et.goal_id = eg.id AND et.status = 'active')
+                 ORDER BY eg.timestamp DESC, eg.id DESC
+                 LIMIT 1
+          ) e ON TRUE
+         WHERE u.user_id = %s
+    """, (user_id,), fetch="one")
+
+    overview = {"has_completed_training": False, "goal": None, "last_reflection": None, "goal_without_tasks": None}
+    if not row:
+        return overview
+    overview["has_completed_training"] = bool(row["has_completed_training"])
+    if row["goal_id"] is not None:
+        overview["goal"] = {
+            "id": row["goal_id"],
+            "goal_text": row["goal_text"],
+            "task_count": row["task_count"],
+            "tasks": [dict(t) for t in row["tasks"]],
+        }
+    if row["reflection_id"] is not None:
+        overview["last_reflection"] = {
+            "id": row["reflection_id"],
+            "week_number": row["week_number"],
+            "session_id": row["session_id"],
+            "done": row["done"],
+            "total": row["total"],
+        }
+    if row["empty_goal_id"] is not None:
+        overview["goal_without_tasks"] = {"id": row["empty_goal_id"], "goal_text": row["empty_goal_text"]}
+    return overview
+
 def get_session_state(user_id):
     row = execute_query(
        "SELECT session_state FROM user_sessions WHERE user_id = %s",
@@ -347,16 +792,114 @@ def get_session_state(user_id):
     )
     return row["session_state"] if row else {}
 
+
+def get_session_bootstrap(user_id, chat_limit=30):
+    """
+    Everything the first render of a session needs, in one round-trip:
+      user               users row (group_assignment, batch, phase, survey flags), None if unknown
+      session_state      saved session JSON ({} if none)
+      goals              [{id, goal_text, task_count}] newest first, active tasks only
+      latest_goal        {id, goal_text, duration_status} or None
+      active_tasks       active tasks of the latest goal [{id, task_text, completed}]
+      latest_reflection  {id, week_number, session_id, completed} for the latest goal, or None
+      completed_reflections  [(week_number, session_id)] completed for the latest goal
+      chat_page          newest `chat_limit` messages of the saved chat_state, oldest first
+                         ({id, sender, message, timestamp}, ordered by (timestamp, id))
+    Returns None if the query failed.
+    """
+    row = execute_query("""
+        SELECT json_build_object(
+            'user', (
+                SELECT row_to_json(u) FROM (
+                    SELECT prolific_code, has_completed_training, group_assignment,
+                           has_completed_presurvey, has_completed_postsurvey, batch, phase
+                      FROM users WHERE user_id = p.user_id
+                ) u),
+            'session_state', COALESCE(s.session_state::json, '{}'::json),
+            'goals', COALESCE((
+                SELECT json_agg(json_build_object(
+                           'id', g.id, 'goal_text', g.goal_text,
+                           'task_count', (SELECT COUNT(*) FROM tasks t WHERE t.goal_id = g.id AND t.status = 'active')
+                       ) ORDER BY g.timestamp DESC, g.id DESC)
+                  FROM goals g WHERE g.user_id = p.user_id
+            ), '[]'::json),
+            'latest_goal', CASE WHEN lg.id IS NULL THEN NULL ELSE
+                json_build_object('id', lg.id, 'goal_text', lg.goal_text, 'duration_status', lg.duration_status) END,
+            'active_tasks', COALESCE((
+                SELECT json_agg(json_build_object('id', t.id, 'task_text', t.task_text, 'completed', t.completed) ORDER BY t.id)
+                  FROM tasks t WHERE t.goal_id = lg.id AND t.status = 'active'
+            ), '[]'::json),
+            'latest_reflection', (
+                SELECT row_to_json(r) FROM (
+                    SELECT id, week_number, session_id, completed FROM reflections
+                     WHERE user_id = p.user_id AND goal_id = lg.id
+                     ORDER BY week_number DESC, session_id DESC, id DESC
+                     LIMIT 1
+                ) r),
+            'completed_reflections', COALESCE((
+                SELECT json_agg(json_build_array(week_number, session_id))
+                  FROM reflections
+                 WHERE user_id = p.user_id AND goal_id = lg.id AND completed = TRUE
+            ), '[]'::json),
+            'chat_page', COALESCE((
+                SELECT json_agg(c ORDER BY c.timestamp ASC, c.id ASC) FROM (
+                    SELECT id, sender, message, timestamp FROM chat_history
+                     WHERE user_id = p.user_id AND phase = s.session_state->>'chat_state'
+                     ORDER BY timestamp DESC, id DESC
+                     LIMIT %s
+                ) c
+            ), '[]'::json)
+        ) AS bootstrap
+          FROM (SELECT %s::text AS user_id) p
+          LEFT JOIN user_sessions s ON s.user_id = p.user_id
+          LEFT JOIN LATERAL (
+                SELECT id, goal_text, duration_status FROM goals
+                 WHERE user_id = p.user_id
+                 ORDER BY timestamp DESC, id DESC
+                 LIMIT 1
+          ) lg ON TRUE
+    """, (chat_limit, user_id), fetch="one")
+    if not row:
+        return None
+
+    # new containers: the nested JSON is shared with the run cache
+    boot = dict(row["bootstrap"])
+    boot["completed_reflections"] = [tuple(r) for r in boot["completed_reflections"]]
+    # same types as get_chat_history_page (timestamps come back from JSON as strings)
+    boot["chat_page"] = [
+        dict(msg, timestamp=datetime.fromisoformat(msg["timestamp"])) for msg in boot["chat_page"]
+    ]
+    return boot
+
 def save_session_state(user_id, state_dict):
     js = json.dumps(state_dict)
-    execute_query("""
+    row = execute_query("""
         INSERT INTO user_sessions(user_id, session_state)
              VALUES (%s, %s)
         ON CONFLICT (user_id) DO UPDATE
           SET session_state = EXCLUDED.session_state,
               updated_at    = NOW()
+        RETURNING 1
     """, 
-    (user_id, js), fetch=None, commit=True),
+    (user_id, js), fetch="one", commit=True)
+    return row is not None
+
+def patch_session_state(user_id, changed, removed_keys=()):
+    """
+    Merge only the changed keys into the stored JSON (and drop removed ones)
+    instead of rewriting the whole blob.
+    """
+    row = execute_query("""
+        INSERT INTO user_sessions(user_id, session_state)
+             VALUES (%s, %s)
+        ON CONFLICT (user_id) DO UPDATE
+          SET session_state = (COALESCE(user_sessions.session_state::jsonb, '{}'::jsonb) - %s::text[])
+                              || EXCLUDED.session_state::jsonb,
+              updated_at    = NOW()
+        RETURNING 1
+    """,
+    (user_id, json.dumps(changed), list(removed_keys)), fetch="one", commit=True)
+    return row is not None
 
 
 # PHASES
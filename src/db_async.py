@@ -0,0 +1,91 @@
+# db_async.py
+#
+# Async twin of execute_query for the FastAPI service (api.py), so request
+# handlers never block the event loop on Postgres. Same SQL, same %s
+# placeholders and same fetch/commit semantics as db.execute_query.
+
+import os
+import asyncio
+import psycopg
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from logger import setup_logger
+
+logger = setup_logger()
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+if not DATABASE_URL:
+    raise ValueError("DATABASE_URL is not set")
+
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+_pool = None
+
+
+async def open_pool():
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN,
+            max_size=DB_POOL_MAX,
+            timeout=DB_POOL_TIMEOUT,
+            kwargs={"row_factory": dict_row},
+            # health check on checkout; broken connections are replaced transparently
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+        await _pool.open()
+        logger.info("Async DB pool opened | min=%s max=%s", DB_POOL_MIN, DB_POOL_MAX)
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def execute_query_async(query, params=(), fetch="one", commit=False):
+    pool = await open_pool()
+    try:
+        async with pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params)
+                if commit:
+                    await conn.commit()
+                if fetch == "one":
+                    return await cursor.fetchone()
+                elif fetch == "all":
+                    return await cursor.fetchall()
+                else:
+                    return None
+    except Exception as e:
+        print("Database error:", e)
+        logger.exception("Database query failed | SQL: %s | Params: %s", query, params)
+        # pool.connection() rolls back on exception
+        return None if fetch == "one" else []
+
+
+async def listen(channel, callback, retry_delay=5):
+    """
+    LISTEN on a Postgres channel forever on a dedicated connection and call
+    callback(payload) for every NOTIFY. Reconnects after errors; meant to run
+    as a background task (cancel it to stop).
+    """
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(DATABASE_URL, autocommit=True) as conn:
+                await conn.execute(f"LISTEN {channel}")
+                logger.info("Listening on channel %s", channel)
+                async for notify in conn.notifies():
+                    callback(notify.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("LISTEN %s failed, reconnecting in %ss", channel, retry_delay)
+            await asyncio.sleep(retry_delay)
@@ -0,0 +1,131 @@
+# db_export.py
+#
+# Streaming table exports. Rows go from Postgres straight into the output
+# file in chunks, nothing is collected in memory, so exporting a table with
+# millions of rows uses as much RAM as exporting ten:
+#   - csv:     COPY (query) TO STDOUT WITH CSV HEADER, written as it arrives
+#   - ndjson:  one JSON object per line, read through a named (server-side)
+#              cursor EXPORT_CHUNK_ROWS rows at a time
+#   - json:    same cursor, written as one JSON array (the old export format)
+# Any of them can be gzip-compressed on the fly (".gz" is appended).
+#
+#   python src/db_export.py chat_history <user_id> --format ndjson --gzip
+
+import os
+import json
+import gzip
+import datetime
+import decimal
+import itertools
+
+from db import get_connection
+from logger import setup_logger
+
+logger = setup_logger()
+
+# Rows fetched per round-trip from a server-side cursor
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "2000"))
+
+FORMATS = ("csv", "ndjson", "json")
+
+_cursor_names = itertools.count()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, memoryview):
+        return value.tobytes().hex()
+    return str(value)
+
+
+def _open(path, compress):
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def _copy_csv(conn, query, params, out):
+    with conn.cursor() as cursor:
+        sql = cursor.mogrify(query, params).decode()
+        cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", out)
+        return cursor.rowcount
+
+
+def _stream_json(conn, query, params, out, fmt):
+    count = 0
+    # named cursor = server-side: rows stay on the server until fetched
+    with conn.cursor(name=f"export_{os.getpid()}_{next(_cursor_names)}") as cursor:
+        cursor.itersize = EXPORT_CHUNK_ROWS
+        cursor.execute(query, params)
+        if fmt == "json":
+            out.write("[")
+        for row in cursor:
+            line = json.dumps(dict(row), default=_json_default, ensure_ascii=False)
+            if fmt == "json":
+                out.write(",\n  " if count else "\n  ")
+                out.write(line)
+            else:
+                out.write(line + "\n")
+            count += 1
+        if fmt == "json":
+            out.write("\n]\n" if count else "]\n")
+    return count
+
+
+def export_query(query, params, path, format="csv", compress=False):
+    """
+    Stream the result of `query` into `path` as csv, ndjson or json.
+    Returns the number of rows written.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported format {format!r}. Use one of: {', '.join(FORMATS)}.")
+    with get_connection() as conn, _open(path, compress) as out:
+        if format == "csv":
+            count = _copy_csv(conn, query, params, out)
+        else:
+            count = _stream_json(conn, query, params, out, format)
+    logger.info("Exported %s rows to %s", count, path)
+    return count
+
+
+def export_path(name, user_id, format, compress=False):
+    path = f"{name}_{user_id}.{format}"
+    return path + ".gz" if compress else path
+
+
+# Per-user exports: name -> query with one %s for the user_id
+USER_EXPORTS = {
+    "chat_history": "SELECT * FROM chat_history WHERE user_id = %s ORDER BY timestamp, id",
+    "goals": "SELECT * FROM goals WHERE user_id = %s ORDER BY id",
+    "tasks": """
+        SELECT tasks.*
+        FROM tasks
+        JOIN goals ON tasks.goal_id = goals.id
+        WHERE goals.user_id = %s
+        ORDER BY tasks.id
+    """,
+    "reflections": "SELECT * FROM reflections WHERE user_id = %s ORDER BY id",
+}
+
+
+def export_user_table(name, user_id, format="csv", compress=False):
+    """Export one USER_EXPORTS table for a user to <name>_<user_id>.<ext>[.gz]."""
+    path = export_path(name, user_id, format, compress)
+    export_query(USER_EXPORTS[name], (user_id,), path, format=format, compress=compress)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream a participant's rows to a file.")
+    parser.add_argument("table", choices=sorted(USER_EXPORTS))
+    parser.add_argument("user_id")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output file")
+    args = parser.parse_args()
+
+    print(export_user_table(args.table, args.user_id, format=args.format, compress=args.gzip))
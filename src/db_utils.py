@@ -1,7 +1,12 @@
 # db_utils.py
+import json
 import streamlit as st
-import pandas as pd
-from db import save_session_state, execute_query  # This brings in your existing global connection
+from db import save_session_state, patch_session_state  # This brings in your existing global connection
+from db_export import export_user_table
+
+# Internal session keys for the persisted-state snapshot (never saved themselves)
+_SNAPSHOT_KEY = "_persisted_state"
+_DIRTY_KEY = "_state_dirty"
 
 
 # At the top of goal_flow.py (or in a shared utils module)
@@ -20,9 +25,17 @@ def build_goal_tasks_text(goal, tasks):
     return "\n".join(lines)
 
 def set_state(**kwargs):
+    """
+    Update st.session_state and mark it for persistence.
+    The DB write itself is coalesced: flush_state() runs once at the end of
+    the script run and only sends the keys that changed.
+    """
     for k, v in kwargs.items():
         st.session_state[k] = v
-    
+    st.session_state[_DIRTY_KEY] = True
+
+
+def _state_to_save():
     dynamic_flags = [k for k in st.session_state.keys()
                      if k.startswith(("ask_", "justifying_", "justified_", "answered_", "rt_"))]
     
@@ -72,56 +85,52 @@ def set_state(**kwargs):
     if "trigger_view_goals" in st.session_state:
         keys_to_save.append("trigger_view_goals")
 
-    to_save = {k: st.session_state.get(k) for k in keys_to_save}
-    save_session_state(st.session_state["user_id"], to_save)
+    return {k: st.session_state.get(k) for k in keys_to_save}
 
 
-def export_chat_history(user_id, format="csv"):
-    query = "SELECT * FROM chat_history WHERE user_id = %s"
-    # df = pd.read_sql_query(query, conn, params=(user_id,))
-    rows = execute_query(query, (user_id,), fetch="all")
-    df = pd.DataFrame(rows)
-    if format == "csv":
-        df.to_csv(f"chat_history_{user_id}.csv", index=False)
-    elif format == "json":
-        df.to_json(f"chat_history_{user_id}.json", orient="records", indent=2)
-    else:
-        raise ValueError("Unsupported format. Use 'csv' or 'json'.")
-
-def export_goals_tasks(user_id, format="csv"):
-    goals_query = "SELECT * FROM goals WHERE user_id = %s"
-    tasks_query = """
-        SELECT tasks.* 
-        FROM tasks 
-        JOIN goals ON tasks.goal_id = goals.id 
-        WHERE goals.user_id = %s
+def flush_state():
     """
+    Persist the session state if set_state() was called since the last flush.
+    The first write of a browser session replaces the stored blob; after that
+    only changed/removed keys are merged in, and nothing is written if no
+    value actually changed.
+    """
+    if not st.session_state.get(_DIRTY_KEY) or "user_id" not in st.session_state:
+        return
+    st.session_state[_DIRTY_KEY] = False
 
-    # goals_df = pd.read_sql_query(goals_query, conn, params=(user_id,))
-    # tasks_df = pd.read_sql_query(tasks_query, conn, params=(user_id,))
-
-    goals_rows = execute_query(goals_query, (user_id,), fetch="all")
-    goals_df = pd.DataFrame(goals_rows)
-    tasks_rows = execute_query(tasks_query, (user_id,), fetch="all")
-    tasks_df = pd.DataFrame(tasks_rows)
+    to_save = _state_to_save()
+    encoded = {k: json.dumps(v) for k, v in to_save.items()}
+    last = st.session_state.get(_SNAPSHOT_KEY)
 
-    if format == "csv":
-        goals_df.to_csv(f"goals_{user_id}.csv", index=False)
-        tasks_df.to_csv(f"tasks_{user_id}.csv", index=False)
-    elif format == "json":
-        goals_df.to_json(f"goals_{user_id}.json", orient="records", indent=2)
-        tasks_df.to_json(f"tasks_{user_id}.json", orient="records", indent=2)
+    if last is None:
+        ok = save_session_state(st.session_state["user_id"], to_save)
     else:
-        raise ValueError("Unsupported format. Use 'csv' or 'json'.")
-
-def export_reflections(user_id, format="csv"):
-    query = "SELECT * FROM reflections WHERE user_id = %s"
-    # df = pd.read_sql_query(query, conn, params=(user_id,))
-    rows = execute_query(query, (user_id,), fetch="all")
-    df = pd.DataFrame(rows)
-    if format == "csv":
-        df.to_csv(f"reflections_{user_id}.csv", index=False)
-    elif format == "json":
-        df.to_json(f"reflections_{user_id}.json", orient="records", indent=2)
+        changed = {k: to_save[k] for k, js in encoded.items() if last.get(k) != js}
+        removed = [k for k in last if k not in encoded]
+        if not changed and not removed:
+            return
+        ok = patch_session_state(st.session_state["user_id"], changed, removed)
+
+    if ok:
+        st.session_state[_SNAPSHOT_KEY] = encoded
     else:
-        raise ValueError("Unsupported format. Use 'csv' or 'json'.")
\ No newline at end of file
+        # keep it dirty so the next flush retries with a full write
+        st.session_state.pop(_SNAPSHOT_KEY, None)
+        st.session_state[_DIRTY_KEY] = True
+
+
+def export_chat_history(user_id, format="csv", compress=False):
+    """Stream the user's chat history to chat_history_<user_id>.<format>[.gz] (csv, ndjson or json)."""
+    return export_user_table("chat_history", user_id, format=format, compress=compress)
+
+def export_goals_tasks(user_id, format="csv", compress=False):
+    """Stream the user's goals and tasks to goals_<user_id>.* and tasks_<user_id>.*"""
+    return (
+        export_user_table("goals", user_id, format=format, compress=compress),
+        export_user_table("tasks", user_id, format=format, compress=compress),
+    )
+
+def export_reflections(user_id, format="csv", compress=False):
+    """Stream the user's reflections to reflections_<user_id>.<format>[.gz]."""
+    return export_user_table("reflections", user_id, format=format, compress=compress)
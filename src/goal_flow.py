@@ -5,13 +5,50 @@ from llama_utils import (
     suggest_specific_fix, suggest_measurable_fix,
     suggest_achievable_fix, suggest_relevant_fix,
     suggest_timebound_fix, suggest_tasks_for_goal,
-    extract_goal_variants, check_smart_feedback
+    extract_goal_variants, check_smart_feedback,
+    prefetch_smart_feedback, SMART_DIMENSIONS
 )
-from db import save_goal, save_task, get_tasks, get_user_phase, update_user_phase, get_chat_history, get_goals
+from db import save_goal, save_task, get_tasks, get_user_phase, update_user_phase, get_chat_history_page, get_goals
 from phases import goal_setting_flow, goal_setting_flow_score
-from chat_thread import ChatThread
+from chat_thread import ChatThread, stream_preview
 from db_utils import build_goal_tasks_text, set_state
 from study_text import study_period_phrase, reflection_invite_phrase
+import os
+
+# Also prefetch the five suggest_*_fix calls (doubles LLM load per goal)
+LLM_PREFETCH_FIXES = os.getenv("LLM_PREFETCH_FIXES", "false").lower() == "true"
+PREFETCH_WAIT = float(os.getenv("LLM_READ_TIMEOUT", "60")) + 5
+
+
+def start_smart_prefetch(goal, next_step):
+    """
+    Speculatively run the SMART checks still ahead of `next_step` for this goal
+    text, all at once. The futures live in session state only (not persisted).
+    """
+    if not next_step.startswith("check_"):
+        return
+    first = next_step[len("check_"):]
+    if first not in SMART_DIMENSIONS:
+        return
+    remaining = SMART_DIMENSIONS[SMART_DIMENSIONS.index(first):]
+    st.session_state["smart_prefetch"] = {
+        "goal": goal,
+        "futures": prefetch_smart_feedback(goal, remaining, include_fixes=LLM_PREFETCH_FIXES),
+    }
+
+
+def take_prefetched(kind, dimension, goal):
+    """Result of a prefetched call for exactly this goal text, or None."""
+    pf = st.session_state.get("smart_prefetch")
+    if not pf or pf["goal"] != goal:
+        return None
+    future = pf["futures"].pop((kind, dimension), None)
+    if future is None:
+        return None
+    try:
+        return future.result(timeout=PREFETCH_WAIT)
+    except Exception:
+        return None
 
 
 def run_goal_setting():
@@ -83,9 +120,11 @@ def run_goal_setting():
     current_index = st.session_state.get("message_index", 0)
 
     if st.session_state.get("just_restored", False):
-        history = get_chat_history(
+        # only need to know whether this phase has any history
+        history = get_chat_history_page(
             st.session_state["user_id"],
-            st.session_state["chat_state"]
+            st.session_state["chat_state"],
+            limit=1
             )
         if history:
             st.session_state["message_index"] = len(texts)
@@ -132,6 +171,8 @@ def run_goal_setting():
                 goal_step = step["next"],
                 message_index = 0
             )
+            if USE_LLM_SCORING:
+                start_smart_prefetch(user_input, step["next"])
             st.rerun()
 
     elif "llm_feedback" in step:
@@ -147,7 +188,10 @@ def run_goal_setting():
             st.rerun()
 
         else:
-            feedback = check_smart_feedback(goal, dimension).strip()
+            feedback = take_prefetched("check", dimension, goal)
+            if feedback is None:
+                feedback = check_smart_feedback(goal, dimension)
+            feedback = feedback.strip()
             # st.session_state["chat_thread"][-1]["message"] = feedback
             st.session_state["llm_feedback_result"] = feedback
             set_state(
@@ -170,18 +214,23 @@ def run_goal_setting():
             st.rerun()
 
         else:
-            if fix_type == "specific":
-                updated_goal = suggest_specific_fix(goal)
+            on_partial, clear_preview = stream_preview()
+            prefetched = take_prefetched("fix", fix_type, goal)
+            if prefetched is not None:
+                updated_goal = prefetched
+            elif fix_type == "specific":
+                updated_goal = suggest_specific_fix(goal, on_partial=on_partial)
             elif fix_type == "measurable":
-                updated_goal = suggest_measurable_fix(goal)
+                updated_goal = suggest_measurable_fix(goal, on_partial=on_partial)
             elif fix_type == "achievable":
-                updated_goal = suggest_achievable_fix(goal)
+                updated_goal = suggest_achievable_fix(goal, on_partial=on_partial)
             elif fix_type == "relevant":
-                updated_goal = suggest_relevant_fix(goal)
+                updated_goal = suggest_relevant_fix(goal, on_partial=on_partial)
             elif fix_type == "timebound":
-                updated_goal = suggest_timebound_fix(goal)
+                updated_goal = suggest_timebound_fix(goal, on_partial=on_partial)
             else:
                 updated_goal = ""
+            clear_preview()
 
             formatted_variants = extract_goal_variants(updated_goal).strip()
             current_goal = st.session_state.get("current_goal", "")
@@ -292,8 +341,9 @@ def run_add_tasks():
         else:
             existing_tasks = [t["task_text"] for t in get_tasks(goal_id)]
             current_goal = st.session_state.get("current_goal", "")
+            on_partial, clear_preview = stream_preview()
             try:
-                suggested = extract_goal_variants(suggest_tasks_for_goal(current_goal, existing_tasks))
+                suggested = extract_goal_variants(suggest_tasks_for_goal(current_goal, existing_tasks, on_partial=on_partial))
             except:
                 suggested = (
                     "- Break down your goal into a 30-minute session<br>"
@@ -301,6 +351,8 @@ def run_add_tasks():
                     "- Set a reminder to check your progress"
                 )
 
+            clear_preview()
+
             if st.session_state["chat_thread"] and st.session_state["chat_thread"][-1]["message"] == "Thinking of task suggestions for you... ✍️":
                 st.session_state["chat_thread"].pop()
                 
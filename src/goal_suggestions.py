@@ -0,0 +1,216 @@
+# goal_suggestions.py
+#
+# Warm cache of precomputed LLM suggestions for common goal archetypes
+# ("learn a language", "exercise more", ...). An offline job runs the fix
+# suggestions, SMART checks and task suggestions over a corpus of goals and
+# stores them in the goal_suggestions table (migrations/0002). At runtime smart_wrapper looks
+# a participant's goal up, so common goals get an instant answer and the live
+# LLM is only the fallback:
+#   - check_* verdicts and the SMART rewrite suggestions judge or rewrite the
+#     exact numbers, frequencies and deadlines, so they are only served for
+#     the same goal (after normalisation)
+#   - task suggestions (GOAL_WARM_FUZZY_KINDS) may also come from a goal with
+#     similar character trigrams, as long as its numbers / days / months /
+#     frequency words are identical
+#
+# Warm the table (once per corpus / prompt change):
+#   python src/goal_suggestions.py goals.txt --workers 4
+
+import os
+import re
+import time
+import threading
+
+from logger import setup_logger
+
+logger = setup_logger()
+
+GOAL_WARM_ENABLED = os.environ.get("GOAL_WARM_ENABLED", "true").lower() == "true"
+# Jaccard similarity of character trigrams needed to reuse a stored goal's answers
+GOAL_WARM_MIN_SIMILARITY = float(os.environ.get("GOAL_WARM_MIN_SIMILARITY", "0.75"))
+# How often the in-process index is re-read from the table
+GOAL_WARM_REFRESH = float(os.environ.get("GOAL_WARM_REFRESH", "600"))
+# Kinds whose answers may be reused for a similar (not identical) goal
+GOAL_WARM_FUZZY_KINDS = ("tasks",)
+
+# Used when the warm job is run without a corpus file
+DEFAULT_CORPUS = [
+    "Learn Spanish", "Learn a new language", "Exercise more", "Go to the gym regularly",
+    "Start running", "Finish my online course", "Complete a programming course", "Learn Python",
+    "Read more books", "Eat healthier", "Drink more water", "Sleep better", "Meditate daily",
+    "Save money", "Study for my exams", "Write my thesis", "Learn to cook", "Practice guitar",
+    "Spend less time on my phone", "Find a new job", "Improve my CV", "Lose weight",
+    "Walk 10000 steps a day", "Journal every day", "Clean and organise my home",
+]
+
+_FILLER = re.compile(r"^(i want to|i would like to|i'd like to|i will|i plan to|my goal is to|to)\s+")
+
+# Words that carry a goal's amount / schedule / deadline
+_DETAIL_WORDS = {
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "weekend", "weekends",
+    "january", "february", "march", "april", "may", "june", "july", "august",
+    "september", "october", "november", "december",
+    "daily", "weekly", "monthly", "yearly", "every", "each", "once", "twice", "times", "per",
+    "day", "days", "week", "weeks", "month", "months", "year", "years",
+    "hour", "hours", "minute", "minutes", "morning", "evening", "night",
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+}
+
+
+def normalise_goal(goal_text):
+    text = re.sub(r"[^a-z0-9 ]+", " ", (goal_text or "").lower())
+    text = " ".join(text.split())
+    return _FILLER.sub("", text)
+
+
+def detail_tokens(normalised):
+    """Numbers and schedule/deadline words of a normalised goal, in order."""
+    return tuple(w for w in normalised.split() if w in _DETAIL_WORDS or any(c.isdigit() for c in w))
+
+
+def trigrams(normalised):
+    padded = f"  {normalised} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class SuggestionStore:
+    def __init__(self, min_similarity=0.75, refresh=600, fuzzy_kinds=("tasks",)):
+        self.min_similarity = min_similarity
+        self.refresh = refresh
+        self.fuzzy_kinds = set(fuzzy_kinds)
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._goals = {}  # normalised goal -> {"grams": set, "details": tuple, "answers": {kind: text}}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _load(self):
+        from db import execute_query
+        rows = execute_query("SELECT goal_norm, kind, response FROM goal_suggestions", fetch="all")
+        goals = {}
+        for row in rows:
+            entry = goals.setdefault(row["goal_norm"], {
+                "grams": trigrams(row["goal_norm"]),
+                "details": detail_tokens(row["goal_norm"]),
+                "answers": {},
+            })
+            entry["answers"][row["kind"]] = row["response"]
+        logger.info("Goal suggestion warm cache loaded | %s goals", len(goals))
+        return goals
+
+    def _current_goals(self):
+        with self._lock:
+            goals = self._goals
+            stale = time.monotonic() - self._loaded_at > self.refresh
+            if stale:
+                # claim the refresh; other sessions keep using the old index meanwhile
+                self._loaded_at = time.monotonic()
+        if stale:
+            try:
+                goals = self._load()
+            except Exception:
+                logger.exception("Loading goal suggestion warm cache failed")
+            else:
+                with self._lock:
+                    self._goals = goals
+        return goals
+
+    def lookup(self, goal_text, kind):
+        """Stored answer of `kind` for this goal (or a close enough one for fuzzy kinds), or None."""
+        goals = self._current_goals()
+
+        norm = normalise_goal(goal_text)
+        best, best_score = None, 0.0
+        entry = goals.get(norm)
+        if entry is not None:
+            best, best_score = entry, 1.0
+        elif kind in self.fuzzy_kinds:
+            grams, details = trigrams(norm), detail_tokens(norm)
+            for candidate in goals.values():
+                if candidate["details"] != details:
+                    continue
+                score = similarity(grams, candidate["grams"])
+                if score > best_score:
+                    best, best_score = candidate, score
+
+        answer = best["answers"].get(kind) if best and best_score >= self.min_similarity else None
+        with self._lock:
+            self.stats["hits" if answer is not None else "misses"] += 1
+        return answer
+
+    def save(self, goal_text, kind, response):
+        from db import execute_query
+        execute_query("""
+            INSERT INTO goal_suggestions (goal_norm, kind, response)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (goal_norm, kind) DO UPDATE
+              SET response = EXCLUDED.response,
+                  created_at = NOW()
+        """, (normalise_goal(goal_text), kind, response), fetch=None, commit=True)
+
+
+_store = SuggestionStore(
+    min_similarity=GOAL_WARM_MIN_SIMILARITY, refresh=GOAL_WARM_REFRESH, fuzzy_kinds=GOAL_WARM_FUZZY_KINDS,
+)
+
+
+def get_suggestion_store():
+    """The process-wide store, or None if the warm cache is switched off."""
+    return _store if GOAL_WARM_ENABLED else None
+
+
+def warm(goals, workers=4):
+    """Run every warmable prompt for each goal against the live LLM and store the real answers."""
+    from concurrent.futures import ThreadPoolExecutor
+    from llama_utils import (
+        SMART_DIMENSIONS, SUGGEST_FIX, check_smart_feedback, suggest_tasks_for_goal, fake_response,
+    )
+
+    jobs = []
+    for goal in goals:
+        for dim in SMART_DIMENSIONS:
+            jobs.append((goal, f"check_{dim}", lambda g=goal, d=dim: check_smart_feedback(g, d)))
+            jobs.append((goal, dim, lambda g=goal, d=dim: SUGGEST_FIX[d](g)))
+        jobs.append((goal, "tasks", lambda g=goal: suggest_tasks_for_goal(g, [])))
+
+    def run(job):
+        goal, kind, fn = job
+        text = fn()
+        # never store fallbacks: they'd be served instead of a real answer forever
+        if not text or text.strip() == fake_response(goal, kind).strip():
+            logger.warning("No LLM answer for %r / %s, skipped", goal, kind)
+            return False
+        _store.save(goal, kind, text)
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        stored = sum(pool.map(run, jobs))
+    logger.info("Warmed %s of %s suggestions for %s goals", stored, len(jobs), len(goals))
+    return stored
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute LLM suggestions for common goals.")
+    parser.add_argument("corpus", nargs="?", help="text file with one goal per line (default: built-in list)")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    # llama_utils imports this file as `goal_suggestions`, not `__main__`;
+    # switch lookups off there so the job hits the LLM instead of its own table
+    import goal_suggestions
+    goal_suggestions.GOAL_WARM_ENABLED = False
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    else:
+        corpus = DEFAULT_CORPUS
+    # one entry per normalised goal
+    corpus = list({normalise_goal(g): g for g in corpus}.values())
+    goal_suggestions.warm(corpus, workers=args.workers)
@@ -1,20 +1,39 @@
 # llama_utils.py
 
-import requests, re
+import requests, re, time
+from concurrent.futures import ThreadPoolExecutor
 from logger import setup_logger
+from llm_client import get_llm_client
+from llm_cache import get_response_cache, cache_key, is_cacheable
+from llm_scheduler import get_llm_scheduler, LLMShedError
+from llm_batcher import get_llm_batcher
+from goal_suggestions import get_suggestion_store
+from prompt_templates import render, record_call, template_stats, RenderedPrompt
+import prompts  # registers the prompt templates used below
+
+import os
 
 # ssh y0iiqsm3h1mvkh-6441165c@ssh.runpod.io -i ~/.ssh/id_ed25519
 # LLM_API_URL = ssh y0iiqsm3h1mvkh-6441165c@ssh.runpod.io -i ~/.ssh/id_ed25519
-LLM_API_URL = "https://y0iiqsm3h1mvkh-11434.proxy.runpod.net/api/generate"
-
-
-
-import os
+LLM_API_URL = os.environ.get("LLM_API_URL", "https://y0iiqsm3h1mvkh-11434.proxy.runpod.net/api/generate")
 
 FAKE_MODE = False
 logger = setup_logger()
 # FAKE_MODE = os.getenv("FAKE_MODE", "true").lower() == "true"
 
+# How long Ollama keeps the model (and its prompt cache) loaded between calls
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")
+
+# Stream tokens to the UI when the caller passes on_partial
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"
+# Types whose answer is a list of 3 variants; the stream is cut once all 3 are in
+VARIANT_TYPES = {"specific", "measurable", "achievable", "relevant", "timebound", "tasks"}
+
+# Speculative prefetch of the SMART checks (see prefetch_smart_feedback)
+SMART_DIMENSIONS = ("specific", "measurable", "achievable", "relevant", "timebound")
+LLM_PREFETCH_WORKERS = int(os.getenv("LLM_PREFETCH_WORKERS", "10"))
+_prefetch_pool = ThreadPoolExecutor(max_workers=LLM_PREFETCH_WORKERS, thread_name_prefix="llm-prefetch")
+
 def extract_goal_variants(response_text):
     parts = re.split(r"<br\s*/?>", response_text)
     variants = [p.strip() for p in parts if p.strip().startswith(("1.","2.","3."))]
@@ -80,21 +99,95 @@ def fake_response(goal_text, type_):
         return "NOLLM"
     return "No fallback guidance available for this type."
 
-def smart_wrapper(prompt, goal_text, type_):
+def count_variants(text):
+    """Number of *complete* list lines ("1. ...", "- ...") in a partial completion."""
+    complete_lines = text.split("\n")[:-1]
+    return sum(1 for line in complete_lines if re.match(r"\s*(\d+[.)]|[-*•])\s+\S", line))
+
+def cut_at_stop(text, stops):
+    """Apply stop sequences to text that is still growing. Returns (text, stopped)."""
+    for stop in stops:
+        idx = text.find(stop)
+        if idx != -1:
+            return text[:idx], True
+    return text, False
+
+def _stream_completion(payload, on_partial, max_variants=None):
+    text = ""
+    stream = get_llm_client(LLM_API_URL).stream_generate(payload)
+    try:
+        for piece in stream:
+            text, stopped = cut_at_stop(text + piece, payload["stop"])
+            on_partial(text.strip().replace("\n", "<br>"))
+            if stopped or (max_variants and count_variants(text) >= max_variants):
+                break
+    finally:
+        # closing the generator drops the connection so the backend stops generating
+        stream.close()
+    return text
+
+def llm_stats():
+    """Counters for monitoring (dev sidebar)."""
+    scheduler = get_llm_scheduler()
+    batcher = get_llm_batcher()
+    breaker = getattr(get_llm_client(LLM_API_URL), "breaker", None)
+    return {
+        "cache": get_response_cache().stats(),
+        "client": dict(get_llm_client(LLM_API_URL).stats),
+        "scheduler": scheduler.snapshot() if scheduler else None,
+        "batcher": batcher.snapshot() if batcher else None,
+        "warm": dict(get_suggestion_store().stats) if get_suggestion_store() else None,
+        "prompts": template_stats(),
+        "breaker": breaker.snapshot() if breaker else None,
+    }
+
+def _scheduled(type_, fn):
+    """Run fn() in a scheduler slot; raises LLMShedError if the slot isn't granted in time."""
+    scheduler = get_llm_scheduler()
+    if scheduler is None:
+        return fn()
+    if not scheduler.acquire(type_):
+        raise LLMShedError(type_)
+    started = time.monotonic()
+    try:
+        return fn()
+    finally:
+        scheduler.release(time.monotonic() - started)
+
+def smart_wrapper(prompt, goal_text, type_, on_partial=None, warm=False):
+    """
+    Run one prompt against the LLM, falling back to fake_response on any failure.
+    If on_partial is given (and LLM_STREAMING is on) the completion is streamed and
+    on_partial(text_so_far) is called as tokens arrive.
+    warm=True lets a precomputed answer for a near-identical goal be served
+    (see goal_suggestions.py); only for prompts that depend on the goal alone.
+    """
     if FAKE_MODE:
         return fake_response(goal_text, type_)
+
+    store = get_suggestion_store() if warm else None
+    if store is not None:
+        precomputed = store.lookup(goal_text, type_)
+        if precomputed is not None:
+            return precomputed
     
-    temp = 0.3 if type_.startswith("check_") else 0.7
-
-    if type_ in ("specific", "measurable", "achievable", "relevant", "timebound"):
-        # single‐sentence suggestions, under 12 words,  36 tokens max
-        max_toks = 25
-    elif type_.startswith("check_"):
-        # feedback
-        max_toks = 60
+    if isinstance(prompt, RenderedPrompt):
+        # registered template: it knows its own budget (see prompts.py)
+        temp = prompt.temperature
+        max_toks = prompt.max_tokens
+        record_call(prompt)
     else:
-        # summaries, tasks, etc.
-        max_toks = 150
+        temp = 0.3 if type_.startswith("check_") else 0.7
+
+        if type_ in ("specific", "measurable", "achievable", "relevant", "timebound"):
+            # single‐sentence suggestions, under 12 words,  36 tokens max
+            max_toks = 25
+        elif type_.startswith("check_"):
+            # feedback
+            max_toks = 60
+        else:
+            # summaries, tasks, etc.
+            max_toks = 150
 
     payload = {
         "model":       "mistral",
@@ -102,17 +195,42 @@ def smart_wrapper(prompt, goal_text, type_):
         "stream":      False,
         "temperature": temp,
         "max_tokens":  max_toks,
-        "stop":        ["\n\n"]
+        "stop":        ["\n\n"],
+        "keep_alive":  LLM_KEEP_ALIVE,
     }
 
+    cache = get_response_cache()
+    use_cache = is_cacheable(type_, temp)
+    if use_cache:
+        key = cache_key(payload["prompt"], payload["model"], temp, max_toks)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    # Backend known to be down: don't even queue for it
+    breaker = getattr(get_llm_client(LLM_API_URL), "breaker", None)
+    if breaker is not None and breaker.is_open():
+        return fake_response(goal_text, type_)
+
+    # Every generation waits for a slot on the shared backend; if the SLO for
+    # this type can't be met we answer with the fallback now instead of after
+    # a long timeout. Non-streamed calls are also coalesced across sessions,
+    # so identical prompts in flight cost one generation.
     try:
-        response = requests.post(LLM_API_URL, json=payload, timeout=60)
-        response.raise_for_status()
+        if on_partial is not None and LLM_STREAMING:
+            max_variants = 3 if type_ in VARIANT_TYPES else None
+            data = _scheduled(type_, lambda: {"response": _stream_completion(payload, on_partial, max_variants)})
+        else:
+            run = lambda: _scheduled(type_, lambda: get_llm_client(LLM_API_URL).generate(payload))
+            batcher = get_llm_batcher()
+            data = batcher.submit(payload, run) if batcher is not None else run()
+    except LLMShedError:
+        return fake_response(goal_text, type_)
     except requests.HTTPError as he:
         logger.error(
             "❌ LLM HTTPError: %s; response body: %s",
             he,
-            response.text,
+            he.response.text if he.response is not None else "",
             exc_info=True
             )
         return fake_response(goal_text, type_)
@@ -123,135 +241,32 @@ def smart_wrapper(prompt, goal_text, type_):
             )
         return fake_response(goal_text, type_)
 
-    text = response.json().get("response", "").strip()
+    text = data.get("response", "").strip()
     # Convert any internal newlines to HTML breaks for your app:
-    return text.replace("\n", "<br>")
-
-def suggest_specific_fix(goal_text):
-    prompt = f"""
-Revise the goal to make it more specific with minimal edits.
+    text = text.replace("\n", "<br>")
+    if use_cache and text:
+        cache.set(key, text, type_)
+    return text
 
-RULE: Preserve the original wording, change no more than 3 words.
+def suggest_specific_fix(goal_text, on_partial=None):
+    prompt = render("fix_specific", goal_text=goal_text)
+    return smart_wrapper(prompt, goal_text, "specific", on_partial=on_partial, warm=True)
 
-- Use simple language, avoid buzzwords like streamline or optimize.
-- Keep it high level, not a simple task or step 
-- Keep it short (under 12 words)
-- Should be breakable into 3 to 4 subtasks
-- Do not phrase it like a task
+def suggest_measurable_fix(goal_text, on_partial=None):
+    prompt = render("fix_measurable", goal_text=goal_text)
+    return smart_wrapper(prompt, goal_text, "measurable", on_partial=on_partial, warm=True)
 
-Example:
-Not good: Learn new job skills
-Better: Complete a beginner Python programming course
+def suggest_achievable_fix(goal_text, on_partial=None):
+    prompt = render("fix_achievable", goal_text=goal_text)
+    return smart_wrapper(prompt, goal_text, "achievable", on_partial=on_partial, warm=True)
 
-Goal:
-{goal_text}
+def suggest_relevant_fix(goal_text, on_partial=None):
+    prompt = render("fix_relevant", goal_text=goal_text)
+    return smart_wrapper(prompt, goal_text, "relevant", on_partial=on_partial, warm=True)
 
-Return only 3 revised versions:
-- ...
-- ...
-- ...
-"""
-    return smart_wrapper(prompt, goal_text, "specific")
-
-def suggest_measurable_fix(goal_text):
-    prompt = f"""
-Revise the goal to make it more measurable with minimal edits by adding a weekly milestone to it.
-
-RULE: Preserve the original wording, change no more than 3 words.
-
-- Use simple language, avoid buzzwords like streamline or optimize.
-- Include a way to track progress
-- Do not use numbers or percentages
-- Keep it goal level, not a performance metric
-- Keep it short (under 12 words)
-- Only make small adjustments.
-- Keep the original meaning and structure as much as possible.
-- Avoid rewriting the entire goal.
-
-Example:
-Good: I want to finish a online programming course.
-Better: I want to finish a online programming course by completing at least 3 modules each week.
-
-Goal:
-{goal_text}
-
-Return only 3 revised versions:
-- ...
-- ...
-- ...
-"""
-    return smart_wrapper(prompt, goal_text, "measurable")
-
-def suggest_achievable_fix(goal_text):
-    prompt = f"""
-Revise the goal to make it more achievable within 2 weeks with minimal edits. Make the scope smaller or in smaller increments.
-
-RULE: Preserve the original wording, change no more than 3 words.
-
-- Use simple language, avoid buzzwords like streamline or optimize.
-- Keep it doable within 2 weeks
-- Stay at the goal level (not tasks)
-- Keep it short (under 12 words)
-
-Not good: Learn Spanish
-Better: Complete beginner Spanish course
-
-Goal:
-{goal_text}
-
-Return only 3 revised versions:
-- ...
-- ...
-- ...
-"""
-    return smart_wrapper(prompt, goal_text, "achievable")
-
-def suggest_relevant_fix(goal_text):
-    prompt = f"""
-Revise the goal to make it more personally relevant with minimal edits.
-
-RULE: Preserve the original wording, change no more than 3 words, just add suggestions of how the goal might be personally relevant to the person.
-
-- Use simple language, avoid buzzwords like streamline or optimize.
-- Add a short reason or benefit (in brackets is okay)
-- Keep it short (under 12 words)
-- Phrase it as a high-level goal
-
-Example: 
-- Complete a beginner Spanish course, so I can speak to my Spanish-speaking family.
-
-Goal:
-{goal_text}
-
-Return only 3 revised versions:
-- ...
-- ...
-- ...
-"""
-    return smart_wrapper(prompt, goal_text, "relevant")
-
-def suggest_timebound_fix(goal_text):
-    prompt = f"""
-Revise the goal to make it more time-bound with minimal edits by adding a timeframe.
-
-RULE: Preserve the original wording, change no more than 3 words.
-
-- Use simple language, avoid buzzwords like streamline or optimize.
-- Add a timeframe (e.g., 2 weeks, end of month), but not a specific date
-- Keep it high-level (not a checklist item)
-- Keep it under 12 words
-
-Example: Finish writing my thesis by the end of the month.
-
-Goal:
-{goal_text}
-
-Return only 3 revised versions:
-- ...
-- ...
-- ...
-"""
-    return smart_wrapper(prompt, goal_text, "timebound")
+def suggest_timebound_fix(goal_text, on_partial=None):
+    prompt = render("fix_timebound", goal_text=goal_text)
+    return smart_wrapper(prompt, goal_text, "timebound", on_partial=on_partial, warm=True)
 
 # def refine_goal(raw_goal):
 #     prompt = f"""
@@ -304,41 +319,12 @@ Now write the summary:
 """
     return smart_wrapper(prompt.strip(), alignment_answer + confidence_answer, "summary")
 
-def suggest_tasks_for_goal(goal_text, existing_tasks=None):
+def suggest_tasks_for_goal(goal_text, existing_tasks=None, on_partial=None):
     existing_tasks = existing_tasks or []
     existing_list = "<br>".join(f"- {task}" for task in existing_tasks) if existing_tasks else "None"
 
-    prompt = f"""
-    You help users break down a SMART goal into short, concrete weekly tasks.
-
-    The user's SMART goal is:
-    [Goal]
-    {goal_text}
-    [/Goal]
-
-    Tasks already added (do not repeat or rephrase these):
-    {existing_list}
-
-    Suggest exactly 3 new weekly tasks. Each task should:
-    - Be actionable and specific (describe the exact action)
-    - Each task must be concise, under 12 words
-    - Be achievable within one week
-    - Do not mention name of day like "by Monday", instead use each week or every 3 days
-    - Include a time, quantity, or duration if relevant
-
-    Avoid:
-    - Rambling or multiple steps per task
-    - Evaluation-heavy instructions
-    - Repeating existing tasks
-    - Generic phrasing like "try to..." or "maybe"
-
-    Respond with only the 3 tasks, in this format:
-
-    1. ...
-    2. ...
-    3. ...
-    """
-    return smart_wrapper(prompt, goal_text, "tasks")
+    prompt = render("tasks_for_goal", goal_text=goal_text, existing_list=existing_list)
+    return smart_wrapper(prompt, goal_text, "tasks", on_partial=on_partial, warm=not existing_tasks)
 
 def suggest_tasks_with_context(
     goal_text,
@@ -346,7 +332,8 @@ def suggest_tasks_with_context(
     existing_tasks=None,
     edit_mode=None,      # "modify" | "replace" | None
     last_task=None,      # text of the task being edited (if any)
-    count=3              # how many suggestions to ask for
+    count=3,             # how many suggestions to ask for
+    on_partial=None      # streaming callback, see smart_wrapper
 ):
 
     ra = reflection_answers or {}
@@ -410,164 +397,51 @@ Suggest exactly 3 weekly tasks with the following rules:
 """
 
     # --- Build the prompt (simple, Mistral-friendly) ---
-    prompt = f"""
-You help users break down a SMART goal into small, concrete weekly tasks.
-
-The user's SMART goal is:
-[Goal]
-{goal_text}
-[/Goal]
-
-{mode_block}
-- Are specific, one clear action per line
-- Under 12 words
-- Achievable within one week
-- Include time/quantity/duration when useful using plain text (e.g., "for 3 days", "200 words")
-- Do NOT mention weekdays or weekends or any day of the week
-- Do NOT use dashes to add timing
-- Do NOT use parentheses (), brackets [] or braces {{}} anywhere
-- Do NOT include labels or headers (no "Note", "Workaround", "Continue")
-- Do NOT copy labels from the context; use the content only
-- No colons ":" and no extra commentary
-
-Tasks already added (do NOT repeat or rephrase these):
-{existing_list}
-
-Notes from the user's reflection (you may use the ideas but never copy labels like "Note:"):
-{reflection_context}
-
-Avoid:
-- Rambling or multiple steps per task
-- Repeating existing tasks
-- Generic phrasing like "try to..." or "maybe"
-
-Respond with only the 3 tasks, exactly in this format:
-1. ...
-2. ...
-3. ...
-"""
+    prompt = render(
+        "tasks_with_context",
+        goal_text=goal_text,
+        mode_block=mode_block,
+        existing_list=existing_list,
+        reflection_context=reflection_context,
+    )
 
-    return smart_wrapper(prompt, goal_text, "tasks")
+    return smart_wrapper(prompt, goal_text, "tasks", on_partial=on_partial)
 
 # CHECK SMART FEEDBACK
 def check_smart_feedback(goal_text, dimension):
     if dimension == "specific":
-        prompt = f"""
-You are a goal support assistant.
-
-RULE: Give one short, friendly sentence evaluating how specific the goal is, without rewriting it.
-
-Focus only on whether the goal names a single clear outcome.
-
-Guidelines:
-- Do not suggest improvements
-- Do not rewrite the goal
-- Keep feedback under 15 words
-- Be warm and encouraging
-- Use the tone of these samples, but write your own sentence.
-
-Stylistic samples:
-- Great focus, this goal names a clear outcome!
-- This goal feels broad, consider honing in on one main result.
-
-[Goal]
-{goal_text}
-[/Goal]
-"""
+        prompt = render("check_specific", goal_text=goal_text)
     elif dimension == "measurable":
-        prompt = f"""
-You are a goal support assistant.
-
-RULE: Give one short, friendly sentence evaluating how measurable the goal is, without rewriting it.
-
-Focus only on whether there is a clear way to track progress.
-
-Guidelines:
-- Do not suggest improvements
-- Do not rewrite the goal
-- Keep feedback under 15 words
-- Be warm and encouraging
-- Use the tone of these samples, but write your own sentence.
-
-Stylistic samples:
-- Good job, this goal includes a clear progress indicator!
-- Almost there, consider adding a way to measure success.
-
-[Goal]
-{goal_text}
-[/Goal]
-"""
+        prompt = render("check_measurable", goal_text=goal_text)
     elif dimension == "achievable":
-        prompt = f"""
-You are a goal support assistant.
-
-RULE: Give one short, friendly sentence evaluating how achievable the goal is, without rewriting it.
-
-Focus only on whether the goal seems realistic for around 2 weeks of effort.
-
-Guidelines:
-- Do not suggest improvements
-- Do not rewrite the goal
-- Keep feedback under 15 words
-- Be warm and encouraging
-- Use the tone of these samples, but write your own sentence.
-
-Stylistic samples:
-- Nice, this goal seems doable within two weeks!
-- Looks good! Make sure it fits your energy.
-
-[Goal]
-{goal_text}
-[/Goal]
-"""
+        prompt = render("check_achievable", goal_text=goal_text)
     elif dimension == "relevant":
-        prompt = f"""
-You are a goal support assistant.
-
-RULE: Give one short, friendly sentence evaluating if the goal states why it is relevant, without rewriting it.
-
-Focus only on whether the goal aligns with personal values or priorities.
-
-Guidelines:
-- Do not suggest improvements
-- Do not rewrite the goal
-- Keep feedback under 15 words
-- Be warm and encouraging
-- Use the tone of these samples, but write your own sentence.
-
-Stylistic samples:
-- Excellent, this goal aligns with what matters to you!
-- Good start, adding why you want to achieve this would make it even better!
-- Feels a bit generic; adding your “why” could help.
-
-[Goal]
-{goal_text}
-[/Goal]
-"""
+        prompt = render("check_relevant", goal_text=goal_text)
     elif dimension == "timebound":
-        prompt = f"""
-You are a goal support assistant.
-
-RULE: Give one short, friendly sentence evaluating how time-bound the goal is, without rewriting it.
-
-Focus only on whether the goal includes a deadline or timeframe.
+        prompt = render("check_timebound", goal_text=goal_text)
+    else:
+        return "Invalid SMART dimension."
 
-Guidelines:
-- Do not suggest improvements
-- Do not rewrite the goal
-- Keep feedback under 15 words
-- Be warm and encouraging
-- Use the tone of these samples, but write your own sentence.
+    return smart_wrapper(prompt, goal_text, f"check_{dimension}", warm=True)
 
-Stylistic samples:
-- Great, this goal has a clear timeframe!
-- Missing a deadline; adding one will help.
 
-[Goal]
-{goal_text}
-[/Goal]
-"""
-    else:
-        return "Invalid SMART dimension."
+SUGGEST_FIX = {
+    "specific":   suggest_specific_fix,
+    "measurable": suggest_measurable_fix,
+    "achievable": suggest_achievable_fix,
+    "relevant":   suggest_relevant_fix,
+    "timebound":  suggest_timebound_fix,
+}
 
-    return smart_wrapper(prompt.strip(), goal_text, f"check_{dimension}")
+def prefetch_smart_feedback(goal_text, dimensions=SMART_DIMENSIONS, include_fixes=False):
+    """
+    Start check_smart_feedback (and optionally suggest_*_fix) for the given
+    dimensions concurrently on the shared prefetch pool.
+    Returns {("check", dim): Future, ("fix", dim): Future}.
+    """
+    futures = {}
+    for dim in dimensions:
+        futures[("check", dim)] = _prefetch_pool.submit(check_smart_feedback, goal_text, dim)
+        if include_fixes:
+            futures[("fix", dim)] = _prefetch_pool.submit(SUGGEST_FIX[dim], goal_text)
+    return futures
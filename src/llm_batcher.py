@@ -0,0 +1,133 @@
+# llm_batcher.py
+#
+# Cross-session coalescing of non-streamed LLM calls.
+#   - single-flight: while a prompt is being generated, identical prompts
+#     (same cache key) from other sessions wait for that one generation
+#     instead of starting their own
+#   - optional micro-batching window (LLM_BATCH_WINDOW_MS > 0): new prompts
+#     are collected for a few ms, which lets more duplicates join, and then
+#     dispatched together as concurrent requests on the pooled session.
+#     Ollama's /api/generate has no multi-prompt endpoint, so "together"
+#     means one burst the server can schedule into its parallel slots.
+# Streamed calls (on_partial) bypass this, they are per-user UI updates.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from logger import setup_logger
+from llm_cache import cache_key
+
+logger = setup_logger()
+
+LLM_SINGLE_FLIGHT = os.environ.get("LLM_SINGLE_FLIGHT", "true").lower() == "true"
+LLM_BATCH_WINDOW_MS = float(os.environ.get("LLM_BATCH_WINDOW_MS", "0"))
+LLM_BATCH_MAX = int(os.environ.get("LLM_BATCH_MAX", "8"))
+LLM_BATCH_WORKERS = int(os.environ.get("LLM_BATCH_WORKERS", "8"))
+
+
+class _Call:
+    def __init__(self, run):
+        self.run = run
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 1
+
+
+class MicroBatcher:
+    def __init__(self, window_ms=0, max_batch=8, workers=8):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> _Call
+        self._pending = []   # [(key, _Call)] waiting for the window to close
+        self._timer = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-batch") if window_ms > 0 else None
+        self.stats = {"calls": 0, "generations": 0, "deduplicated": 0, "batches": 0, "largest_batch": 0}
+
+    def submit(self, payload, run):
+        """
+        Return run()'s result for this payload, sharing one run() among all
+        callers asking for the same prompt at the same time. run must be a
+        callable doing the actual generation (it may raise; the error is
+        re-raised in every caller that joined).
+        """
+        key = cache_key(payload["prompt"], payload.get("model"), payload.get("temperature"), payload.get("max_tokens"))
+        leader = False
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._inflight.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats["deduplicated"] += 1
+            else:
+                call = self._inflight[key] = _Call(run)
+                self.stats["generations"] += 1
+                if self._executor is None:
+                    leader = True
+                else:
+                    self._pending.append((key, call))
+                    if len(self._pending) >= self.max_batch:
+                        self._dispatch_locked()
+                    elif self._timer is None:
+                        self._timer = threading.Timer(self.window, self._dispatch)
+                        self._timer.daemon = True
+                        self._timer.start()
+
+        if leader:
+            self._execute(key, call)
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return dict(call.result) if isinstance(call.result, dict) else call.result
+
+    def _dispatch(self):
+        with self._lock:
+            self._dispatch_locked()
+
+    def _dispatch_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+        for key, call in batch:
+            self._executor.submit(self._execute, key, call)
+
+    def _execute(self, key, call):
+        try:
+            call.result = call.run()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._inflight), pending=len(self._pending))
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_llm_batcher():
+    """The process-wide batcher, or None if single-flight is switched off."""
+    global _batcher
+    if not LLM_SINGLE_FLIGHT:
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    window_ms=LLM_BATCH_WINDOW_MS,
+                    max_batch=LLM_BATCH_MAX,
+                    workers=LLM_BATCH_WORKERS,
+                )
+    return _batcher
@@ -0,0 +1,183 @@
+# llm_cache.py
+#
+# Response cache for smart_wrapper. Keyed on the normalised prompt, model,
+# temperature and token limit. Two tiers:
+#   - in-process LRU with TTL (always on)
+#   - optional Postgres table shared by all app processes (LLM_CACHE_DB=true)
+# Only real LLM answers are cached, never fake_response fallbacks.
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from logger import setup_logger
+
+logger = setup_logger()
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_DB = os.environ.get("LLM_CACHE_DB", "false").lower() == "true"
+LLM_CACHE_DB_MAX_ROWS = int(os.environ.get("LLM_CACHE_DB_MAX_ROWS", "20000"))
+# Opt-out: prompt types that should always get a fresh generation, and a
+# temperature ceiling above which answers are considered too random to reuse.
+LLM_CACHE_SKIP_TYPES = {
+    t.strip() for t in os.environ.get("LLM_CACHE_SKIP_TYPES", "summary").split(",") if t.strip()
+}
+LLM_CACHE_MAX_TEMPERATURE = float(os.environ.get("LLM_CACHE_MAX_TEMPERATURE", "1.0"))
+
+
+def normalise_prompt(prompt):
+    # prompts are built from indented f-strings; whitespace differences are not meaningful
+    return " ".join(prompt.split())
+
+
+def cache_key(prompt, model, temperature, max_tokens):
+    raw = json.dumps([normalise_prompt(prompt), model, temperature, max_tokens])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(type_, temperature):
+    return (
+        LLM_CACHE_ENABLED
+        and type_ not in LLM_CACHE_SKIP_TYPES
+        and temperature <= LLM_CACHE_MAX_TEMPERATURE
+    )
+
+
+class LRUCache:
+    def __init__(self, maxsize=512, ttl=86400):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.evictions += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+
+class PostgresCache:
+    """
+    Second tier in the llm_cache table (created by migrations/0002), so cache
+    entries survive restarts and are shared.
+    """
+
+    TRIM_EVERY = 100  # sets between size trims
+
+    def __init__(self, ttl=86400, max_rows=20000):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._sets = 0
+
+    def get(self, key):
+        from db import execute_query
+        row = execute_query("""
+            SELECT response FROM llm_cache
+             WHERE key = %s AND created_at > NOW() - make_interval(secs => %s)
+        """, (key, self.ttl), fetch="one")
+        return row["response"] if row else None
+
+    def set(self, key, value, type_=None):
+        from db import execute_query
+        execute_query("""
+            INSERT INTO llm_cache (key, type, response)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (key) DO UPDATE
+              SET response = EXCLUDED.response,
+                  type = EXCLUDED.type,
+                  created_at = NOW()
+        """, (key, type_, value), fetch=None, commit=True)
+        self._sets += 1
+        if self._sets % self.TRIM_EVERY == 0:
+            self.trim()
+
+    def trim(self):
+        from db import execute_query
+        execute_query("""
+            DELETE FROM llm_cache
+             WHERE created_at < NOW() - make_interval(secs => %s)
+                OR key IN (SELECT key FROM llm_cache ORDER BY created_at DESC OFFSET %s)
+        """, (self.ttl, self.max_rows), fetch=None, commit=True)
+
+
+class ResponseCache:
+    def __init__(self, memory, persistent=None):
+        self.memory = memory
+        self.persistent = persistent
+        self._stats_lock = threading.Lock()
+        self.counters = {"hits_memory": 0, "hits_db": 0, "misses": 0, "sets": 0}
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits_memory")
+            return value
+        if self.persistent is not None:
+            try:
+                value = self.persistent.get(key)
+            except Exception:
+                logger.exception("LLM cache DB lookup failed")
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("hits_db")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key, value, type_=None):
+        self.memory.set(key, value)
+        self._count("sets")
+        if self.persistent is not None:
+            try:
+                self.persistent.set(key, value, type_)
+            except Exception:
+                logger.exception("LLM cache DB write failed")
+
+    def stats(self):
+        with self._stats_lock:
+            out = dict(self.counters)
+        lookups = out["hits_memory"] + out["hits_db"] + out["misses"]
+        out["hit_rate"] = round((out["hits_memory"] + out["hits_db"]) / lookups, 3) if lookups else 0.0
+        out["memory_size"] = len(self.memory)
+        out["evictions"] = self.memory.evictions
+        return out
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.counters[name] += 1
+
+
+_cache = ResponseCache(
+    LRUCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL),
+    PostgresCache(ttl=LLM_CACHE_TTL, max_rows=LLM_CACHE_DB_MAX_ROWS) if LLM_CACHE_DB else None,
+)
+
+
+def get_response_cache():
+    return _cache
@@ -0,0 +1,270 @@
+# llm_client.py
+#
+# Shared HTTP client for the Ollama-style /api/generate endpoint.
+# One pooled requests.Session per process, so SMART checks, fix suggestions and
+# task suggestions reuse warm keep-alive connections instead of paying a new
+# TLS handshake to the inference proxy on every call.
+
+import os
+import json
+import time
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from logger import setup_logger
+from llm_replay import RecordingClient, ReplayClient, LLM_REPLAY_LATENCY, LLM_REPLAY_JITTER, \
+    LLM_REPLAY_SEED, LLM_REPLAY_TOKEN_DELAY
+
+logger = setup_logger()
+
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "20"))
+# Offline benchmarking (see llm_replay.py): record real traffic, or replay it
+LLM_RECORD_FILE = os.environ.get("LLM_RECORD_FILE")
+LLM_REPLAY_FILE = os.environ.get("LLM_REPLAY_FILE")
+
+# Gateway/overload answers from the proxy that are safe to retry
+RETRY_STATUS = {429, 502, 503, 504}
+
+# Circuit breaker: after this many consecutive failed calls the backend is
+# considered down and calls fail immediately for LLM_BREAKER_COOLDOWN seconds,
+# then LLM_BREAKER_PROBES trial calls decide whether to close it again.
+LLM_BREAKER_THRESHOLD = int(os.environ.get("LLM_BREAKER_THRESHOLD", "5"))  # 0 = no breaker
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "30"))
+LLM_BREAKER_PROBES = int(os.environ.get("LLM_BREAKER_PROBES", "1"))
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold=5, cooldown=30, probes=1):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.probes = probes
+        self.state = self.CLOSED
+        self.failures = 0  # consecutive
+        self.opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def is_open(self):
+        """Cheap check without taking a probe slot: True while calls would be rejected."""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at < self.cooldown
+            if self.state == self.HALF_OPEN:
+                return self._probes_in_flight >= self.probes
+            return False
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probes_in_flight = 0
+                logger.info("LLM circuit half-open, probing the backend")
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self._probes_in_flight < self.probes:
+                self._probes_in_flight += 1
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("LLM circuit closed again")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probes_in_flight = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probes_in_flight = 0
+                self.stats["opened"] += 1
+                logger.error("LLM circuit OPEN after %s consecutive failures, failing fast for %.0fs",
+                             self.failures, self.cooldown)
+
+    def record_abandoned(self):
+        """A call ended without telling us anything (stream closed before any data)."""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes_in_flight:
+                self._probes_in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, state=self.state, consecutive_failures=self.failures)
+
+
+class LLMClient:
+    def __init__(self, url, connect_timeout=5, read_timeout=60, max_retries=2,
+                 backoff_base=0.5, pool_size=20, breaker=None):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+        self.session = requests.Session()
+        # Retries are handled in generate() so they get jittered backoff and logging
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+        self.breaker = breaker
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+
+    def generate(self, payload):
+        """
+        POST the payload and return the decoded JSON body.
+        Connection errors and 429/502/503/504 are retried with jittered
+        exponential backoff (generation has no side effects). Read timeouts
+        are not retried, since that would multiply the wait. Raises the last
+        error once retries are exhausted, or CircuitOpenError right away
+        while the breaker is open.
+        """
+        self._check_breaker()
+        try:
+            data = self._post(payload, stream=False).json()
+        except Exception as e:
+            self._record_outcome(e)
+            raise
+        self._record_outcome(None)
+        return data
+
+    def stream_generate(self, payload):
+        """
+        Generator over the text fragments of a streamed generation
+        (Ollama NDJSON: one {"response": "...", "done": false} object per line).
+        Closing the generator early drops the connection, which makes the
+        backend stop generating.
+        """
+        self._check_breaker()
+        outcome_known = False
+        try:
+            response = self._post(dict(payload, stream=True), stream=True)
+            with response:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(f"LLM stream error: {chunk['error']}")
+                    if not outcome_known:
+                        # first data from the backend: it's alive
+                        self._record_outcome(None)
+                        outcome_known = True
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        return
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            if not outcome_known:
+                self._record_outcome(e)
+                outcome_known = True
+            raise
+        finally:
+            if not outcome_known and self.breaker is not None:
+                self.breaker.record_abandoned()
+
+    def _check_breaker(self):
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError("LLM backend circuit is open")
+
+    def _record_outcome(self, error):
+        if self.breaker is None:
+            return
+        if error is None:
+            self.breaker.record_success()
+        elif isinstance(error, requests.HTTPError) and error.response is not None \
+                and error.response.status_code < 500 and error.response.status_code != 429:
+            # our request was bad, the backend itself is fine
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def _post(self, payload, stream=False):
+        attempt = 0
+        while True:
+            self._count("requests")
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout, stream=stream)
+                if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                    reason = f"HTTP {response.status_code}"
+                    response.close()
+                else:
+                    response.raise_for_status()
+                    return response
+            except requests.ConnectionError as e:
+                # also covers ConnectTimeout; ReadTimeout is not a ConnectionError
+                if attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                reason = type(e).__name__
+            except Exception:
+                self._count("failures")
+                raise
+
+            attempt += 1
+            self._count("retries")
+            delay = random.uniform(0, self.backoff_base * (2 ** attempt))
+            logger.warning("LLM request failed (%s), retry %s/%s in %.2fs", reason, attempt, self.max_retries, delay)
+            time.sleep(delay)
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client(url):
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if LLM_REPLAY_FILE:
+                    _client = ReplayClient(
+                        LLM_REPLAY_FILE,
+                        latency=LLM_REPLAY_LATENCY,
+                        jitter=LLM_REPLAY_JITTER,
+                        seed=LLM_REPLAY_SEED,
+                        token_delay=LLM_REPLAY_TOKEN_DELAY,
+                    )
+                else:
+                    _client = LLMClient(
+                        url,
+                        connect_timeout=LLM_CONNECT_TIMEOUT,
+                        read_timeout=LLM_READ_TIMEOUT,
+                        max_retries=LLM_MAX_RETRIES,
+                        backoff_base=LLM_BACKOFF_BASE,
+                        pool_size=LLM_POOL_SIZE,
+                        breaker=CircuitBreaker(
+                            threshold=LLM_BREAKER_THRESHOLD,
+                            cooldown=LLM_BREAKER_COOLDOWN,
+                            probes=LLM_BREAKER_PROBES,
+                        ) if LLM_BREAKER_THRESHOLD > 0 else None,
+                    )
+                    if LLM_RECORD_FILE:
+                        logger.info("Recording LLM traffic to %s", LLM_RECORD_FILE)
+                        _client = RecordingClient(_client, LLM_RECORD_FILE)
+    return _client
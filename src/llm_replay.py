@@ -0,0 +1,143 @@
+# llm_replay.py
+#
+# Offline LLM backends for benchmarking without the RunPod endpoint.
+#   - RecordingClient wraps the real LLMClient and appends every
+#     prompt/response pair to a JSONL file (LLM_RECORD_FILE).
+#   - ReplayClient serves those pairs back with synthetic latency
+#     (LLM_REPLAY_FILE), so flows can be timed deterministically.
+# Both expose the same generate()/stream_generate()/stats surface as LLMClient,
+# get_llm_client() picks one based on the env vars.
+
+import os
+import json
+import time
+import random
+import threading
+
+from logger import setup_logger
+from llm_cache import cache_key
+
+logger = setup_logger()
+
+# Seconds added to every replayed call, or "recorded" to reuse the latency
+# measured while recording.
+LLM_REPLAY_LATENCY = os.environ.get("LLM_REPLAY_LATENCY", "recorded")
+# Uniform +/- jitter (seconds) on top, drawn from a seeded RNG so runs repeat
+LLM_REPLAY_JITTER = float(os.environ.get("LLM_REPLAY_JITTER", "0"))
+LLM_REPLAY_SEED = int(os.environ.get("LLM_REPLAY_SEED", "0"))
+# Delay between streamed fragments (one fragment per word)
+LLM_REPLAY_TOKEN_DELAY = float(os.environ.get("LLM_REPLAY_TOKEN_DELAY", "0.02"))
+
+
+def payload_key(payload):
+    return cache_key(
+        payload.get("prompt", ""),
+        payload.get("model"),
+        payload.get("temperature"),
+        payload.get("max_tokens"),
+    )
+
+
+def load_recordings(path):
+    """Read a recording file into {key: record}. Later records win."""
+    records = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rec = json.loads(line)
+                records[rec["key"]] = rec
+    return records
+
+
+class RecordingClient:
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+        self.stats = inner.stats
+        self.breaker = inner.breaker
+        self._lock = threading.Lock()
+
+    def generate(self, payload):
+        start = time.perf_counter()
+        data = self.inner.generate(payload)
+        self._record(payload, data.get("response", ""), time.perf_counter() - start, stream=False)
+        return data
+
+    def stream_generate(self, payload):
+        start = time.perf_counter()
+        pieces = []
+        try:
+            for piece in self.inner.stream_generate(payload):
+                pieces.append(piece)
+                yield piece
+        finally:
+            # a stream the app cut early is recorded as what the app actually saw
+            if pieces:
+                self._record(payload, "".join(pieces), time.perf_counter() - start, stream=True)
+
+    def _record(self, payload, response, latency, stream):
+        rec = {
+            "key": payload_key(payload),
+            "model": payload.get("model"),
+            "temperature": payload.get("temperature"),
+            "max_tokens": payload.get("max_tokens"),
+            "prompt": payload.get("prompt", ""),
+            "response": response,
+            "latency": round(latency, 4),
+            "stream": stream,
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+
+
+class ReplayClient:
+    def __init__(self, path, latency="recorded", jitter=0.0, seed=0, token_delay=0.02):
+        self.path = path
+        self.records = load_recordings(path)
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "replay_misses": 0}
+        logger.info("LLM replay backend | %s recordings from %s", len(self.records), path)
+
+    def generate(self, payload):
+        rec = self._lookup(payload)
+        time.sleep(self._delay(rec))
+        return {"response": rec["response"], "done": True}
+
+    def stream_generate(self, payload):
+        rec = self._lookup(payload)
+        time.sleep(self._delay(rec, streaming=True))
+        words = rec["response"].split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            yield word if i == len(words) - 1 else word + " "
+
+    def _lookup(self, payload):
+        with self._lock:
+            self.stats["requests"] += 1
+            rec = self.records.get(payload_key(payload))
+            if rec is None:
+                self.stats["replay_misses"] += 1
+                self.stats["failures"] += 1
+        if rec is None:
+            # smart_wrapper treats this like any backend failure -> fake_response
+            raise LookupError("No recorded LLM response for this prompt")
+        return rec
+
+    def _delay(self, rec, streaming=False):
+        if self.latency == "recorded":
+            base = rec.get("latency", 0.0)
+            if streaming and rec.get("stream"):
+                # recorded stream latency already includes the per-token time
+                base = max(0.0, base - self.token_delay * len(rec["response"].split(" ")))
+        else:
+            base = float(self.latency)
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, base + jitter)
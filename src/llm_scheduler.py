@@ -0,0 +1,142 @@
+# llm_scheduler.py
+#
+# Process-wide admission control for LLM calls. Every Streamlit session thread
+# goes through one scheduler before hitting the single Mistral instance:
+#   - at most LLM_MAX_IN_FLIGHT generations run at once, the rest queue
+#   - the queue is ordered by priority: interactive check_* feedback first,
+#     then the goal fix suggestions, then tasks, then summaries
+#   - each priority has a latency SLO. If the estimated queue wait plus the
+#     typical generation time would blow it, the call is shed right away and
+#     smart_wrapper answers with fake_response instead of making the user
+#     wait for the 60s timeout.
+# The generation time estimate is an EWMA over completed calls.
+
+import os
+import time
+import heapq
+import itertools
+import threading
+
+from logger import setup_logger
+
+logger = setup_logger()
+
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "4"))  # 0 = no scheduling
+LLM_EWMA_ALPHA = float(os.environ.get("LLM_EWMA_ALPHA", "0.2"))
+# Initial guess for one generation until real calls have been measured
+LLM_SERVICE_ESTIMATE = float(os.environ.get("LLM_SERVICE_ESTIMATE", "3"))
+
+# priority -> latency SLO in seconds (queue wait + generation)
+PRIORITY_CHECK, PRIORITY_FIX, PRIORITY_TASKS, PRIORITY_SUMMARY = 0, 1, 2, 3
+LLM_SLO = {
+    PRIORITY_CHECK:   float(os.environ.get("LLM_SLO_CHECK", "10")),
+    PRIORITY_FIX:     float(os.environ.get("LLM_SLO_FIX", "15")),
+    PRIORITY_TASKS:   float(os.environ.get("LLM_SLO_TASKS", "25")),
+    PRIORITY_SUMMARY: float(os.environ.get("LLM_SLO_SUMMARY", "40")),
+}
+
+
+class LLMShedError(RuntimeError):
+    """The scheduler gave up on a call to protect its latency SLO."""
+
+
+def priority_for(type_):
+    if type_.startswith("check_"):
+        return PRIORITY_CHECK
+    if type_ in ("specific", "measurable", "achievable", "relevant", "timebound"):
+        return PRIORITY_FIX
+    if type_ == "summary":
+        return PRIORITY_SUMMARY
+    return PRIORITY_TASKS
+
+
+class LLMScheduler:
+    def __init__(self, max_in_flight=4, slo=None, alpha=0.2, service_estimate=3.0):
+        self.max_in_flight = max_in_flight
+        self.slo = dict(slo or LLM_SLO)
+        self.alpha = alpha
+        self.service_time = service_estimate  # EWMA, seconds
+        self.in_flight = 0
+        self._queue = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {"granted": 0, "queued": 0, "shed_estimate": 0, "shed_timeout": 0}
+
+    def acquire(self, type_):
+        """
+        Wait for a generation slot. Returns True when the caller may call the
+        LLM (and must call release() afterwards), False when it should fall
+        back because the SLO can't be met.
+        """
+        prio = priority_for(type_)
+        slo = self.slo[prio]
+        with self._cond:
+            if self.in_flight < self.max_in_flight and not self._queue:
+                self.in_flight += 1
+                self.stats["granted"] += 1
+                return True
+
+            ahead = sum(1 for p, _ in self._queue if p <= prio)
+            # slots free up every service_time / max_in_flight on average
+            est_wait = (ahead + 1) * self.service_time / self.max_in_flight
+            if est_wait + self.service_time > slo:
+                self.stats["shed_estimate"] += 1
+                logger.warning("LLM scheduler: shedding %s (est. wait %.1fs, SLO %.0fs)", type_, est_wait, slo)
+                return False
+
+            entry = (prio, next(self._seq))
+            heapq.heappush(self._queue, entry)
+            self.stats["queued"] += 1
+            deadline = time.monotonic() + max(0.0, slo - self.service_time)
+            while not (self._queue[0] == entry and self.in_flight < self.max_in_flight):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self.stats["shed_timeout"] += 1
+                    self._cond.notify_all()
+                    logger.warning("LLM scheduler: %s waited past its queue budget", type_)
+                    return False
+                self._cond.wait(remaining)
+
+            heapq.heappop(self._queue)
+            self.in_flight += 1
+            self.stats["granted"] += 1
+            self._cond.notify_all()
+            return True
+
+    def release(self, elapsed=None):
+        with self._cond:
+            self.in_flight -= 1
+            if elapsed is not None:
+                self.service_time += self.alpha * (elapsed - self.service_time)
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return dict(
+                self.stats,
+                in_flight=self.in_flight,
+                waiting=len(self._queue),
+                service_time=round(self.service_time, 2),
+            )
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler():
+    """The process-wide scheduler, or None if LLM_MAX_IN_FLIGHT is 0."""
+    global _scheduler
+    if LLM_MAX_IN_FLIGHT <= 0:
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(
+                    max_in_flight=LLM_MAX_IN_FLIGHT,
+                    alpha=LLM_EWMA_ALPHA,
+                    service_estimate=LLM_SERVICE_ESTIMATE,
+                )
+    return _scheduler
@@ -0,0 +1,333 @@
+# migrate.py
+#
+# Versioned schema migrations for the app database (DATABASE_URL).
+# Files live in src/migrations as NNNN_name.sql and are applied in order,
+# each exactly once, recorded in schema_migrations.
+#
+#   python src/migrate.py               apply pending migrations
+#   python src/migrate.py status        list applied / pending
+#   python src/migrate.py check-plans   EXPLAIN every db.py / api.py query on
+#                                        seeded data, fail on sequential scans
+#
+# Files containing CREATE INDEX CONCURRENTLY can't run inside a transaction,
+# so they are executed statement by statement in autocommit mode; invalid
+# leftovers of a previously interrupted concurrent build are dropped first.
+# Everything else runs in one transaction per file.
+
+import os
+import re
+import sys
+import hashlib
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from logger import setup_logger
+
+logger = setup_logger()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+CONCURRENT_INDEX_RE = re.compile(r"CREATE\s+INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)", re.I)
+# any constant works, it only has to be the same for every runner
+LOCK_KEY = 4711_2024
+
+
+def discover():
+    migrations = []
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        m = FILE_RE.match(name)
+        if m:
+            with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as f:
+                sql = f.read()
+            migrations.append({
+                "version": m.group(1),
+                "name": m.group(2),
+                "sql": sql,
+                "checksum": hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+                "concurrent": "CONCURRENTLY" in sql.upper(),
+            })
+    return migrations
+
+
+def split_statements(sql):
+    # our migrations have no functions / DO blocks, so ";" at line end is enough
+    body = "\n".join(line for line in sql.splitlines() if not line.strip().startswith("--"))
+    return [s.strip() for s in re.split(r";\s*(?:\n|$)", body) if s.strip()]
+
+
+def connect():
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        raise ValueError("DATABASE_URL is not set")
+    return psycopg2.connect(url, cursor_factory=RealDictCursor)
+
+
+def applied_versions(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version    TEXT PRIMARY KEY,
+                name       TEXT NOT NULL,
+                checksum   TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+        rows = {r["version"]: r["checksum"] for r in cur.fetchall()}
+    conn.commit()
+    return rows
+
+
+def _drop_invalid_indexes(conn, names):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname
+              FROM pg_index i
+              JOIN pg_class c ON c.oid = i.indexrelid
+             WHERE NOT i.indisvalid AND c.relname = ANY(%s)
+        """, (list(names),))
+        for row in cur.fetchall():
+            logger.warning("Dropping invalid index %s left by an interrupted build", row["relname"])
+            cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{row["relname"]}"')
+
+
+def apply(conn, migration):
+    label = f"{migration['version']}_{migration['name']}"
+    if migration["concurrent"]:
+        conn.autocommit = True
+        try:
+            _drop_invalid_indexes(conn, CONCURRENT_INDEX_RE.findall(migration["sql"]))
+            with conn.cursor() as cur:
+                for statement in split_statements(migration["sql"]):
+                    cur.execute(statement)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (migration["version"], migration["name"], migration["checksum"]),
+                )
+        finally:
+            conn.autocommit = False
+    else:
+        with conn.cursor() as cur:
+            cur.execute(migration["sql"])
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (migration["version"], migration["name"], migration["checksum"]),
+            )
+        conn.commit()
+    logger.info("Applied migration %s", label)
+
+
+def migrate():
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            # one runner at a time (two app instances deploying together)
+            cur.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+        conn.commit()
+        done = applied_versions(conn)
+        pending = [m for m in discover() if m["version"] not in done]
+        for m in discover():
+            if m["version"] in done and done[m["version"]] != m["checksum"]:
+                logger.warning("Migration %s_%s changed after it was applied", m["version"], m["name"])
+        for m in pending:
+            apply(conn, m)
+        if not pending:
+            logger.info("Schema is up to date")
+        return len(pending)
+    finally:
+        if not conn.closed:
+            conn.rollback()  # in case a migration failed mid-transaction
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+        conn.commit()
+        conn.close()
+
+
+def status():
+    conn = connect()
+    try:
+        done = applied_versions(conn)
+    finally:
+        conn.close()
+    for m in discover():
+        state = "applied" if m["version"] in done else "PENDING"
+        if m["version"] in done and done[m["version"]] != m["checksum"]:
+            state = "applied (file changed since)"
+        print(f"{m['version']}_{m['name']:<40} {state}")
+
+
+# -------------------------------
+# Plan check
+# -------------------------------
+
+SEED_SQL = """
+    INSERT INTO users (user_id, prolific_code, group_assignment, batch)
+    SELECT 'plancheck-' || i, 'plancheck-' || i, (i %% 2)::text, 1 FROM generate_series(1, %(n)s) i;
+
+    INSERT INTO goals (user_id, goal_text)
+    SELECT 'plancheck-' || i, 'Seed goal ' || i FROM generate_series(1, %(n)s) i;
+
+    INSERT INTO tasks (goal_id, task_text, status)
+    SELECT g.id, 'Seed task ' || k, CASE WHEN k = 4 THEN 'archived' ELSE 'active' END
+      FROM goals g, generate_series(1, 4) k
+     WHERE g.user_id LIKE 'plancheck-%%';
+
+    INSERT INTO reflections (user_id, goal_id, reflection_text, week_number, session_id, completed)
+    SELECT g.user_id, g.id, 'Seed reflection', w, s, TRUE
+      FROM goals g, generate_series(1, 2) w, unnest(ARRAY['a', 'b']) s
+     WHERE g.user_id LIKE 'plancheck-%%';
+
+    INSERT INTO reflection_responses (reflection_id, task_id, progress_rating)
+    SELECT r.id, NULL, k
+      FROM reflections r, generate_series(2, 4) k
+     WHERE r.user_id LIKE 'plancheck-%%';
+
+    INSERT INTO chat_history (user_id, sender, message, timestamp, phase)
+    SELECT 'plancheck-' || i, CASE WHEN m %% 2 = 0 THEN 'bot' ELSE 'user' END, 'Seed message',
+           NOW() - m * INTERVAL '1 minute', 'goal_setting'
+      FROM generate_series(1, %(n)s) i, generate_series(1, 20) m;
+
+    INSERT INTO user_sessions (user_id, session_state)
+    SELECT 'plancheck-' || i, '{}'::jsonb FROM generate_series(1, %(n)s) i;
+
+    ANALYZE users, goals, tasks, reflections, reflection_responses, chat_history, user_sessions, reflection_drafts;
+"""
+
+# Inline queries of api.py (kept in sync by hand)
+API_QUERIES = {
+    "api: presurvey flag": ("""
+        UPDATE users
+           SET has_completed_presurvey = TRUE,
+               onboarding_completed_at = COALESCE(onboarding_completed_at, NOW())
+         WHERE prolific_code = %s
+        RETURNING 1
+    """, ("plancheck-1",)),
+    "api: postsurvey flag": (
+        "UPDATE users SET has_completed_postsurvey = TRUE WHERE prolific_code = %s RETURNING 1", ("plancheck-1",)),
+    "api: user by prolific_code": (
+        "SELECT user_id, group_assignment FROM users WHERE prolific_code = %s", ("plancheck-1",)),
+    "api: latest goal + active tasks": ("""
+        SELECT u.user_id, g.id, g.goal_text,
+               (SELECT json_agg(json_build_object('task_text', t.task_text, 'completed', t.completed) ORDER BY t.id)
+                  FROM tasks t WHERE t.goal_id = g.id AND t.status = 'active')
+          FROM users u
+          LEFT JOIN LATERAL (
+                SELECT id, goal_text FROM goals WHERE user_id = u.user_id ORDER BY timestamp DESC LIMIT 1
+          ) g ON TRUE
+         WHERE u.prolific_code = %s
+    """, ("plancheck-1",)),
+}
+
+
+def _seq_scans(plan):
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def check_plans(seed_rows=2000):
+    """
+    Seed synthetic participants inside a transaction, EXPLAIN the SQL of
+    every db.py helper (and the api.py lookups) with enable_seqscan off, and
+    roll everything back. Returns the list of (helper, tables) doing
+    sequential scans, i.e. queries no index can serve.
+    """
+    import db
+
+    plans = []
+    current = {"name": None}
+
+    def explain(conn, query, params, fetch, commit):
+        with conn.cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cursor.fetchone()
+            plan = plan["QUERY PLAN"] if isinstance(plan, dict) else plan[0]
+            plans.append((current["name"], plan[0]["Plan"]))
+        return None if fetch == "one" else []
+
+    class _Rollback(Exception):
+        pass
+
+    try:
+        with db.transaction() as conn:
+            with conn.cursor() as cur:
+                cur.execute(SEED_SQL, {"n": seed_rows})
+                cur.execute("SELECT id FROM goals WHERE user_id = 'plancheck-1'")
+                goal_id = cur.fetchone()["id"]
+                cur.execute("SELECT id FROM tasks WHERE goal_id = %s LIMIT 1", (goal_id,))
+                task_id = cur.fetchone()["id"]
+                cur.execute("SELECT id FROM reflections WHERE goal_id = %s LIMIT 1", (goal_id,))
+                reflection_id = cur.fetchone()["id"]
+                cur.execute("SELECT NOW() AS now")
+                now = cur.fetchone()["now"]
+                cur.execute("SET LOCAL enable_seqscan = off")
+
+            u = "plancheck-1"
+            helpers = {
+                "get_user_info": lambda: db.get_user_info(u),
+                "get_user_group": lambda: db.get_user_group(u),
+                "user_completed_training": lambda: db.user_completed_training(u),
+                "get_user_phase": lambda: db.get_user_phase(u),
+                "update_user_phase": lambda: db.update_user_phase(u, 2),
+                "get_chat_history": lambda: db.get_chat_history(u, "goal_setting"),
+                "get_chat_history_page": lambda: db.get_chat_history_page(u, "goal_setting"),
+                "get_chat_history_page(before)": lambda: db.get_chat_history_page(u, "goal_setting", before=(now, 0)),
+                "get_goals": lambda: db.get_goals(u),
+                "get_goal_duration_status": lambda: db.get_goal_duration_status(goal_id),
+                "get_tasks": lambda: db.get_tasks(goal_id),
+                "get_tasks(all)": lambda: db.get_tasks(goal_id, active_only=False),
+                "update_task_completion": lambda: db.update_task_completion(task_id, True),
+                "archive_task": lambda: db.archive_task(task_id),
+                "get_reflections": lambda: db.get_reflections(u),
+                "user_goals_exist": lambda: db.user_goals_exist(u),
+                "get_last_reflection": lambda: db.get_last_reflection(u, goal_id),
+                "get_next_week_number": lambda: db.get_next_week_number(u, goal_id),
+                "reflection_exists": lambda: db.reflection_exists(u, goal_id, 1, "a"),
+                "get_goals_with_task_counts": lambda: db.get_goals_with_task_counts(u),
+                "load_reflection_draft": lambda: db.load_reflection_draft(u, goal_id, 1, "a"),
+                "delete_reflection_draft": lambda: db.delete_reflection_draft(u, goal_id, 1, "a"),
+                "get_last_reflection_meta": lambda: db.get_last_reflection_meta(u, goal_id),
+                "get_reflection_responses": lambda: db.get_reflection_responses(reflection_id),
+                "get_session_state": lambda: db.get_session_state(u),
+                "get_session_bootstrap": lambda: db.get_session_bootstrap(u),
+                "get_goal_overview": lambda: db.get_goal_overview(u),
+            }
+            for name, (sql, params) in API_QUERIES.items():
+                helpers[name] = lambda sql=sql, params=params: db.execute_query(sql, params, fetch="all")
+
+            original_run = db._run
+            db._run = explain
+            try:
+                for name, call in helpers.items():
+                    current["name"] = name
+                    call()
+            finally:
+                db._run = original_run
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+    failures = []
+    for name, plan in plans:
+        scans = [t for t in _seq_scans(plan) if t]
+        print(f"{'SEQ SCAN' if scans else 'ok':<9} {name}" + (f"  ({', '.join(scans)})" if scans else ""))
+        if scans:
+            failures.append((name, scans))
+    return failures
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "migrate":
+        migrate()
+    elif command == "status":
+        status()
+    elif command == "check-plans":
+        rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        sys.exit(1 if check_plans(rows) else 0)
+    else:
+        print("usage: python src/migrate.py [migrate|status|check-plans [seed_rows]]")
+        sys.exit(2)
@@ -0,0 +1,88 @@
+-- Baseline schema: the tables the app already uses, as created by hand in
+-- production before migrations existed. IF NOT EXISTS everywhere so it is a
+-- no-op on the live database and builds a fresh one (local / CI / staging).
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id                  TEXT PRIMARY KEY,
+    prolific_code            TEXT,
+    group_assignment         TEXT DEFAULT '0',
+    batch                    INTEGER DEFAULT -1,
+    phase                    INTEGER DEFAULT 0,
+    has_completed_training   BOOLEAN DEFAULT FALSE,
+    has_completed_presurvey  BOOLEAN DEFAULT FALSE,
+    has_completed_postsurvey BOOLEAN DEFAULT FALSE,
+    created_at               TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS goals (
+    id              SERIAL PRIMARY KEY,
+    user_id         TEXT NOT NULL REFERENCES users (user_id),
+    goal_text       TEXT NOT NULL,
+    duration_status TEXT,
+    timestamp       TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id                  SERIAL PRIMARY KEY,
+    goal_id             INTEGER NOT NULL REFERENCES goals (id),
+    task_text           TEXT NOT NULL,
+    status              TEXT NOT NULL DEFAULT 'active',
+    completed           BOOLEAN NOT NULL DEFAULT FALSE,
+    replaced_by_task_id INTEGER,
+    replacement_reason  TEXT,
+    timestamp           TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS reflections (
+    id              SERIAL PRIMARY KEY,
+    user_id         TEXT NOT NULL REFERENCES users (user_id),
+    goal_id         INTEGER REFERENCES goals (id),
+    reflection_text TEXT,
+    week_number     INTEGER NOT NULL,
+    session_id      TEXT NOT NULL DEFAULT 'a',
+    completed       BOOLEAN NOT NULL DEFAULT FALSE,
+    timestamp       TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS reflection_responses (
+    id                SERIAL PRIMARY KEY,
+    reflection_id     INTEGER NOT NULL REFERENCES reflections (id),
+    task_id           INTEGER,
+    progress_rating   TEXT,
+    update_type       TEXT,
+    updated_task_text TEXT,
+    answer_key        TEXT,
+    answer_text       TEXT,
+    timestamp         TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS reflection_drafts (
+    user_id            TEXT NOT NULL,
+    goal_id            INTEGER NOT NULL,
+    week_number        INTEGER NOT NULL,
+    session_id         TEXT NOT NULL,
+    task_progress      JSONB,
+    reflection_answers JSONB,
+    reflection_step    INTEGER,
+    update_task_idx    INTEGER,
+    reflection_q_idx   INTEGER,
+    awaiting_task_edit BOOLEAN,
+    editing_choice     TEXT,
+    updated_at         TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, goal_id, week_number, session_id)
+);
+
+CREATE TABLE IF NOT EXISTS chat_history (
+    id        SERIAL PRIMARY KEY,
+    user_id   TEXT NOT NULL,
+    sender    TEXT NOT NULL,
+    message   TEXT,
+    phase     TEXT,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS user_sessions (
+    user_id       TEXT PRIMARY KEY,
+    session_state JSONB,
+    updated_at    TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
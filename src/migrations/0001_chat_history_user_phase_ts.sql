@@ -0,0 +1,5 @@
+-- Keyset pagination of chat history on session restore (db.get_chat_history_page).
+-- CONCURRENTLY: builds without locking chat_history against inserts
+-- (src/migrate.py runs such files outside a transaction).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_history_user_phase_ts_idx
+    ON chat_history (user_id, phase, timestamp);
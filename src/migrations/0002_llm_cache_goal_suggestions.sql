@@ -0,0 +1,19 @@
+-- Tables that llm_cache.py and goal_suggestions.py used to create lazily.
+
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key        TEXT PRIMARY KEY,
+    type       TEXT,
+    response   TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- PostgresCache.trim() drops the oldest rows
+CREATE INDEX IF NOT EXISTS llm_cache_created_at_idx ON llm_cache (created_at);
+
+CREATE TABLE IF NOT EXISTS goal_suggestions (
+    goal_norm  TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    response   TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (goal_norm, kind)
+);
@@ -0,0 +1,23 @@
+-- Indexes for every lookup in db.py and api.py (checked by
+-- `python src/migrate.py check-plans`). INCLUDE columns make the common
+-- reads index-only. CONCURRENTLY so the live tables stay writable.
+
+-- api.py: participant lookups by Prolific code
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_prolific_code_idx
+    ON users (prolific_code);
+
+-- get_goals / get_goals_with_task_counts / api latest goal (ORDER BY timestamp DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS goals_user_ts_idx
+    ON goals (user_id, timestamp DESC) INCLUDE (id, goal_text);
+
+-- get_tasks(goal_id, active_only), task counts, api task list
+CREATE INDEX CONCURRENTLY IF NOT EXISTS tasks_goal_status_idx
+    ON tasks (goal_id, status) INCLUDE (id, task_text, completed);
+
+-- get_last_reflection(_meta), get_next_week_number, reflection_exists, get_reflections
+CREATE INDEX CONCURRENTLY IF NOT EXISTS reflections_user_goal_week_idx
+    ON reflections (user_id, goal_id, week_number DESC, session_id DESC, id DESC) INCLUDE (completed);
+
+-- get_reflection_responses
+CREATE INDEX CONCURRENTLY IF NOT EXISTS reflection_responses_reflection_idx
+    ON reflection_responses (reflection_id) INCLUDE (task_id, progress_rating);
@@ -0,0 +1,8 @@
+-- Keyset pagination of chat history pages by (timestamp, id), so messages
+-- sharing a timestamp are neither skipped nor reordered
+-- (db.get_chat_history_page, the bootstrap chat page). Supersedes the
+-- (user_id, phase, timestamp) index of 0001.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chat_history_user_phase_ts_id_idx
+    ON chat_history (user_id, phase, timestamp, id);
+
+DROP INDEX CONCURRENTLY IF EXISTS chat_history_user_phase_ts_idx;
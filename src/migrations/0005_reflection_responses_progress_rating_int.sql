@@ -0,0 +1,16 @@
+-- reflection_responses.progress_rating holds the 0-4 task progress ratings
+-- (the app writes ints and counts "done" as = 4). 0000_baseline declared it
+-- TEXT, so databases created from the baseline get the column converted;
+-- where it already is an integer (production) this does nothing.
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+         WHERE table_schema = current_schema()
+           AND table_name = 'reflection_responses'
+           AND column_name = 'progress_rating') <> 'integer' THEN
+        ALTER TABLE reflection_responses
+            ALTER COLUMN progress_rating TYPE INTEGER
+            USING NULLIF(trim(progress_rating), '')::integer;
+    END IF;
+END
+$$;
@@ -0,0 +1,4 @@
+-- api.py update_flag("presurvey") stamps Day 0 of the study into
+-- users.onboarding_completed_at, which 0000_baseline left out. Production
+-- already has the column, so this only changes freshly created databases.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS onboarding_completed_at TIMESTAMPTZ;
@@ -0,0 +1,126 @@
+# prompt_templates.py
+#
+# Registry of the LLM prompt templates (the texts live in prompts.py).
+# Each template knows its generation settings and its token budget:
+#   - the static prefix (everything before the first {field}) is rendered and
+#     tokenised once at registration, only the per-call part is counted
+#   - render() returns the prompt text plus prompt/completion token counts,
+#     and smart_wrapper warns when they don't fit the model's context window
+# The prefix is byte-identical on every call and comes first, so with
+# keep_alive the backend keeps the model loaded and can reuse the cached
+# prefix instead of re-encoding it.
+#
+# Token counts use a local HuggingFace tokenizer.json when PROMPT_TOKENIZER
+# points at one (pip install tokenizers), otherwise ~4 characters per token.
+
+import os
+import string
+import threading
+
+from logger import setup_logger
+
+logger = setup_logger()
+
+PROMPT_TOKENIZER = os.environ.get("PROMPT_TOKENIZER")  # path to tokenizer.json
+# Context window of the served model (Ollama's num_ctx)
+LLM_NUM_CTX = int(os.environ.get("LLM_NUM_CTX", "2048"))
+
+_tokenizer = None
+_tokenizer_loaded = False
+
+
+def _get_tokenizer():
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        _tokenizer_loaded = True
+        if PROMPT_TOKENIZER:
+            try:
+                from tokenizers import Tokenizer
+                _tokenizer = Tokenizer.from_file(PROMPT_TOKENIZER)
+            except Exception:
+                logger.warning("Could not load tokenizer %s, estimating tokens from length", PROMPT_TOKENIZER)
+    return _tokenizer
+
+
+def count_tokens(text):
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return (len(text) + 3) // 4
+
+
+class RenderedPrompt(str):
+    """Prompt text that also carries its template and token budget."""
+
+    def __new__(cls, text, template, prompt_tokens):
+        obj = super().__new__(cls, text)
+        obj.template = template
+        obj.prompt_tokens = prompt_tokens
+        obj.max_tokens = template.max_tokens
+        obj.temperature = template.temperature
+        return obj
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.max_tokens
+
+
+class PromptTemplate:
+    def __init__(self, name, text, max_tokens, temperature):
+        self.name = name
+        self.text = text
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+        parts = list(string.Formatter().parse(text))
+        self.fields = [field for _, field, _, _ in parts if field is not None]
+        # the literal text before the first field, with {{ }} already unescaped
+        self.prefix = parts[0][0] if parts else ""
+        self.prefix_tokens = count_tokens(self.prefix.lstrip())
+
+    def render(self, **fields):
+        text = self.text.format(**fields)
+        # leading/trailing whitespace is stripped before sending, count what is sent
+        sent = text.strip()
+        prefix = self.prefix.lstrip()
+        if sent.startswith(prefix):
+            tokens = self.prefix_tokens + count_tokens(sent[len(prefix):])
+        else:
+            tokens = count_tokens(sent)
+        return RenderedPrompt(text, self, tokens)
+
+
+_templates = {}
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def register(name, text, max_tokens, temperature):
+    _templates[name] = PromptTemplate(name, text, max_tokens, temperature)
+    return _templates[name]
+
+
+def render(name, **fields):
+    return _templates[name].render(**fields)
+
+
+def record_call(prompt):
+    """Account one call's budget; warns if prompt + completion exceed the context window."""
+    if prompt.total_tokens > LLM_NUM_CTX:
+        logger.warning(
+            "Prompt %s needs %s tokens (%s prompt + %s completion), context is %s",
+            prompt.template.name, prompt.total_tokens, prompt.prompt_tokens, prompt.max_tokens, LLM_NUM_CTX,
+        )
+    with _stats_lock:
+        s = _stats.setdefault(prompt.template.name, {
+            "calls": 0, "prompt_tokens": 0, "max_prompt_tokens": 0,
+            "prefix_tokens": prompt.template.prefix_tokens, "completion_budget": prompt.max_tokens,
+        })
+        s["calls"] += 1
+        s["prompt_tokens"] += prompt.prompt_tokens
+        s["max_prompt_tokens"] = max(s["max_prompt_tokens"], prompt.prompt_tokens)
+
+
+def template_stats():
+    with _stats_lock:
+        return {name: dict(s) for name, s in _stats.items()}
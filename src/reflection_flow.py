@@ -5,11 +5,12 @@ from db import (
     get_goals, get_tasks, save_reflection, update_task_completion, get_user_info,
     save_task, get_last_reflection, get_next_week_number, reflection_exists,
     get_user_phase, update_user_phase, get_user_group, replace_or_modify_task, get_goal_duration_status,
-    save_reflection_response, save_reflection_draft, load_reflection_draft, delete_reflection_draft
+    save_reflection_responses, save_reflection_draft, load_reflection_draft,
+    delete_reflection_draft, transaction
 )
 from llama_utils import summarize_reflection, suggest_tasks_with_context
 import json
-from chat_thread import ChatThread
+from chat_thread import ChatThread, stream_preview
 from db_utils import set_state
 
 import os
@@ -212,9 +213,12 @@ def run_weekly_reflection():
 
     post_submit = st.session_state.get("_post_submit", False)
 
-    phase = get_user_phase(user_id)
+    # set by the startup block on a session's first run (see get_session_bootstrap)
+    boot = st.session_state.get("_bootstrap")
 
-    all_goals = get_goals(user_id)
+    phase = boot["user"]["phase"] if boot and boot["user"] else get_user_phase(user_id)
+
+    all_goals = boot["goals"] if boot else get_goals(user_id)
     if not all_goals:
         st.info("You have no goals to reflect on yet.")
         return
@@ -223,7 +227,10 @@ def run_weekly_reflection():
     goal_id = all_goals[0]["id"]
     goal_text = all_goals[0]["goal_text"]
 
-    goal_duration_status=get_goal_duration_status(goal_id) or "standard"
+    if boot:
+        goal_duration_status = boot["latest_goal"]["duration_status"] or "standard"
+    else:
+        goal_duration_status = get_goal_duration_status(goal_id) or "standard"
 
     # --- STICKY SUCCESS SCREEN: handle cold reloads safely ---
     if st.session_state.get("_post_submit"):
@@ -258,7 +265,12 @@ def run_weekly_reflection():
             pass
 
 
-    if reflection_exists(user_id, goal_id, week, session) \
+    if boot:
+        already_submitted = (week, session) in boot["completed_reflections"]
+    else:
+        already_submitted = reflection_exists(user_id, goal_id, week, session)
+
+    if already_submitted \
         and not st.session_state.get("summary_pending", False) \
         and not post_submit \
         and not st.session_state.get("rt_gate_active", False) \
@@ -408,6 +420,7 @@ def run_weekly_reflection():
                 # Allow variants when modifying: don't blacklist the current task
                 existing_for_llm = [t for t in all_existing if t != cur_task_text] if edit_mode == "modify" else all_existing
 
+                on_partial, clear_preview = stream_preview()
                 suggestions = suggest_tasks_with_context(
                     goal_text,
                     reflection_answers=reflection_answers,
@@ -415,7 +428,9 @@ def run_weekly_reflection():
                     edit_mode=edit_mode if edit_mode in ("modify", "replace") else None,
                     last_task=cur_task_text,
                     count=3,
+                    on_partial=on_partial,
                 )
+                clear_preview()
                 if suggestions:
                     st.session_state["chat_thread"].append({
                         "sender": "Assistant",
@@ -781,6 +796,7 @@ def run_weekly_reflection():
                 all_existing = [t["task_text"] for t in frozen] if frozen else []
                 existing_for_llm = [t for t in all_existing if t != cur_task_text] if edit_mode == "modify" else all_existing
 
+                on_partial, clear_preview = stream_preview()
                 suggestions = suggest_tasks_with_context(
                     goal_text,
                     reflection_answers=reflection_answers,
@@ -788,7 +804,9 @@ def run_weekly_reflection():
                     edit_mode=edit_mode if edit_mode in ("modify", "replace") else None,
                     last_task=cur_task_text,
                     count=3,
+                    on_partial=on_partial,
                 )
+                clear_preview()
                 if suggestions:
                     st.session_state["chat_thread"].append({
                         "sender": "Assistant",
@@ -875,14 +893,13 @@ def run_weekly_reflection():
         # Save once
         commit_key = f"ref_committed_w{week}_s{session}"
         if not st.session_state.get(commit_key):
-            reflection_id = save_reflection(user_id, goal_id, reflection_text, week_number=week, session_id=session)
-            update_user_phase(user_id, phase + 1)
             frozen = st.session_state.get("frozen_tasks", [
                 {"id": t["id"], "task_text": t["task_text"]} for t in tasks
             ])
+            responses = []
             for task in frozen:
                 rating = st.session_state["task_progress"].get(task["id"], 0)
-                save_reflection_response(reflection_id, task_id=task["id"], progress_rating=rating)
+                responses.append({"task_id": task["id"], "progress_rating": rating})
             for key, answer in st.session_state["reflection_answers"].items():
                 task_id_for_key = None; answer_key = key
                 if key.startswith("justification_"):
@@ -890,8 +907,18 @@ def run_weekly_reflection():
                         task_id_for_key = int(key.split("_",1)[1]); answer_key = "justification"
                     except Exception:
                         task_id_for_key = None
-                save_reflection_response(reflection_id, task_id=task_id_for_key, answer_key=answer_key, answer_text=answer)
-            delete_reflection_draft(user_id, goal_id, week, session)
+                responses.append({"task_id": task_id_for_key, "answer_key": answer_key, "answer_text": answer})
+
+            # One transaction: either the whole reflection is stored or nothing is
+            try:
+                with transaction():
+                    reflection_id = save_reflection(user_id, goal_id, reflection_text, week_number=week, session_id=session)
+                    update_user_phase(user_id, phase + 1)
+                    save_reflection_responses(reflection_id, responses)
+                    delete_reflection_draft(user_id, goal_id, week, session)
+            except Exception:
+                st.error("⚠️ We couldn't save your reflection just now. Please wait a moment and refresh the page to try again.")
+                st.stop()
 
             st.session_state[commit_key] = True
             st.session_state["reflection_text_cached"] = reflection_text  # for summary
@@ -939,7 +966,9 @@ def run_weekly_reflection():
             if not st.session_state.get("rt_msg_suggest"):
                 existing_tasks = [t["task_text"] for t in get_tasks(goal_id, active_only=True)]
                 reflection_answers = st.session_state.get("reflection_answers", {})
-                suggestions_html = suggest_tasks_with_context(goal_text, reflection_answers, existing_tasks)
+                on_partial, clear_preview = stream_preview()
+                suggestions_html = suggest_tasks_with_context(goal_text, reflection_answers, existing_tasks, on_partial=on_partial)
+                clear_preview()
                 # Only append if we received suggestions
                 if suggestions_html:
                     st.session_state["chat_thread"].append({
@@ -0,0 +1,282 @@
+# snapshot.py
+#
+# Study-wide analysis snapshot: dumps the study tables into compressed
+# Parquet datasets, one directory per table, hive-partitioned by the
+# participant's batch and group_assignment:
+#   <out>/chat_history/batch=2/group_assignment=1/part-<run>-0.parquet
+# Every row carries user_id, batch and group_assignment (joined from users),
+# so the datasets can be read and filtered directly with pyarrow / pandas /
+# polars / duckdb.
+#
+# Tables are read in parallel, one connection each, all from the same
+# exported REPEATABLE READ snapshot, so they are consistent with each other.
+# Rows are streamed through server-side cursors in EXPORT_CHUNK_ROWS chunks.
+#
+# Incremental runs: the append-only tables (chat_history,
+# reflection_responses) only read rows newer than the high-water mark stored
+# in <out>/_snapshot_state.json and add new part files. Tables are dumped
+# into scratch directories and only published (and the marks advanced)
+# once every table succeeded. The other tables are
+# small and their rows change (phase, task status, completion), so they are
+# rewritten on every run. --full rewrites everything.
+#
+#   pip install pyarrow
+#   python src/snapshot.py exports/ [--full] [--workers 6] [--compression zstd]
+
+import os
+import json
+import time
+import shutil
+import datetime
+import itertools
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from db import get_connection
+from db_export import EXPORT_CHUNK_ROWS
+from logger import setup_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = ds = None
+
+logger = setup_logger()
+
+# Rows younger than this are left for the next run: they may belong to
+# transactions (or chat_writer batches) that haven't committed yet.
+SNAPSHOT_LAG_SECONDS = float(os.environ.get("SNAPSHOT_LAG_SECONDS", "300"))
+
+STATE_FILE = "_snapshot_state.json"
+PARTITIONING = ["batch", "group_assignment"]
+
+# name -> (query, high-water-mark column or None for a full rewrite)
+TABLES = {
+    "users": ("""
+        SELECT u.*
+        FROM users u
+    """, None),
+    "goals": ("""
+        SELECT g.*, u.batch, u.group_assignment
+        FROM goals g
+        JOIN users u ON u.user_id = g.user_id
+    """, None),
+    "tasks": ("""
+        SELECT t.*, g.user_id, u.batch, u.group_assignment
+        FROM tasks t
+        JOIN goals g ON g.id = t.goal_id
+        JOIN users u ON u.user_id = g.user_id
+    """, None),
+    "reflections": ("""
+        SELECT r.*, u.batch, u.group_assignment
+        FROM reflections r
+        JOIN users u ON u.user_id = r.user_id
+    """, None),
+    "reflection_responses": ("""
+        SELECT rr.*, r.user_id, u.batch, u.group_assignment
+        FROM reflection_responses rr
+        JOIN reflections r ON r.id = rr.reflection_id
+        JOIN users u ON u.user_id = r.user_id
+    """, "rr.timestamp"),
+    "chat_history": ("""
+        SELECT c.*, u.batch, u.group_assignment
+        FROM chat_history c
+        JOIN users u ON u.user_id = c.user_id
+    """, "c.timestamp"),
+}
+
+_cursor_names = itertools.count()
+
+
+def _arrow_type(type_code):
+    """Arrow type for a Postgres type OID (anything unknown is kept as text)."""
+    return {
+        16: pa.bool_(),
+        20: pa.int64(), 21: pa.int16(), 23: pa.int32(),
+        700: pa.float32(), 701: pa.float64(), 1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+        1184: pa.timestamp("us", tz="UTC"),
+    }.get(type_code, pa.string())
+
+
+def _to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):  # json / jsonb
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _batches(cursor, schema, first_chunk):
+    chunk = first_chunk
+    while chunk:
+        columns = {}
+        for field in schema:
+            values = [row[field.name] for row in chunk]
+            if pa.types.is_string(field.type):
+                values = [_to_text(v) for v in values]
+            elif pa.types.is_floating(field.type):
+                values = [None if v is None else float(v) for v in values]
+            columns[field.name] = values
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+        chunk = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+
+
+def _dump_table(name, out_dir, snapshot_id, since, until, run_id, compression):
+    query, hwm_column = TABLES[name]
+    params = []
+    if hwm_column is not None:
+        query += f" WHERE {hwm_column} <= %s"
+        params.append(until)
+        if since is not None:
+            query += f" AND {hwm_column} > %s"
+            params.append(since)
+
+    target = _scratch_dir(out_dir, name, run_id)
+    started = time.perf_counter()
+    rows = 0
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+        with conn.cursor(name=f"snapshot_{os.getpid()}_{next(_cursor_names)}") as cursor:
+            cursor.itersize = EXPORT_CHUNK_ROWS
+            cursor.execute(query, params)
+            first = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if first:
+                schema = pa.schema([(col.name, _arrow_type(col.type_code)) for col in cursor.description])
+
+                def counted():
+                    nonlocal rows
+                    for batch in _batches(cursor, schema, first):
+                        rows += batch.num_rows
+                        yield batch
+
+                ds.write_dataset(
+                    pa.RecordBatchReader.from_batches(schema, counted()),
+                    target,
+                    format="parquet",
+                    partitioning=PARTITIONING,
+                    partitioning_flavor="hive",
+                    basename_template=f"part-{run_id}-{{i}}.parquet",
+                    existing_data_behavior="overwrite_or_ignore",
+                    file_options=ds.ParquetFileFormat().make_write_options(compression=compression),
+                )
+
+    logger.info("Snapshot %s: %s rows%s in %.1fs", name, rows,
+                " (incremental)" if since is not None else "", time.perf_counter() - started)
+    return rows
+
+
+def _scratch_dir(out_dir, name, run_id):
+    return os.path.join(out_dir, f".{name}.{run_id}")
+
+
+def _publish(out_dir, name, run_id, incremental):
+    """Move a finished table dump from its scratch directory into place."""
+    scratch = _scratch_dir(out_dir, name, run_id)
+    table_dir = os.path.join(out_dir, name)
+    if not incremental:
+        if os.path.isdir(table_dir):
+            shutil.rmtree(table_dir)
+        if os.path.isdir(scratch):
+            os.replace(scratch, table_dir)
+        else:
+            os.makedirs(table_dir, exist_ok=True)  # empty table
+        return
+    # incremental: add the new part files next to the existing ones,
+    # never over them (that would silently drop an earlier run's rows)
+    moves = [
+        (os.path.join(root, file), os.path.join(table_dir, os.path.relpath(root, scratch), file))
+        for root, _, files in os.walk(scratch) for file in files
+    ]
+    for _, target in moves:
+        if os.path.exists(target):
+            raise FileExistsError(f"snapshot part file already exists: {target}")
+    for source, target in moves:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source, target)
+    shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _load_state(out_dir):
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(out_dir, state):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def snapshot(out_dir, tables=None, full=False, workers=None, compression="zstd"):
+    """
+    Write (or refresh) the Parquet snapshot in out_dir.
+    Returns {table: rows written this run}.
+    """
+    if pa is None:
+        raise RuntimeError("snapshot export needs pyarrow: pip install pyarrow")
+    tables = list(tables or TABLES)
+    os.makedirs(out_dir, exist_ok=True)
+    hwm = dict(_load_state(out_dir).get("high_water_marks", {}))
+    if full:
+        for name in tables:
+            hwm.pop(name, None)
+    # part file names are part-<run_id>-<i>, so run_id must differ between
+    # runs even when two of them start within the same second
+    run_id = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%f") + "-" + uuid.uuid4().hex[:8]
+
+    # Coordinator transaction: its snapshot is shared with every table worker
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cursor.execute("SELECT pg_export_snapshot() AS snapshot_id, now() AS now")
+            row = cursor.fetchone()
+        until = row["now"] - datetime.timedelta(seconds=SNAPSHOT_LAG_SECONDS)
+
+        def dump(name):
+            since = hwm.get(name)
+            since = datetime.datetime.fromisoformat(since) if since else None
+            return name, _dump_table(name, out_dir, row["snapshot_id"], since, until, run_id, compression)
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers or len(tables)) as pool:
+                counts = dict(pool.map(dump, tables))
+        except BaseException:
+            # nothing is published and the high-water marks stay put,
+            # so the next run reads the same rows again
+            for name in tables:
+                shutil.rmtree(_scratch_dir(out_dir, name, run_id), ignore_errors=True)
+            raise
+
+    for name in tables:
+        _publish(out_dir, name, run_id, incremental=TABLES[name][1] is not None and name in hwm)
+    for name in tables:
+        if TABLES[name][1] is not None:
+            hwm[name] = until.isoformat()
+    _save_state(out_dir, {"last_run": run_id, "high_water_marks": hwm})
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Study-wide Parquet snapshot, partitioned by batch and group.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--full", action="store_true", help="ignore high-water marks and rewrite every table")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), help="default: all")
+    parser.add_argument("--workers", type=int, help="parallel table dumps (default: one per table)")
+    parser.add_argument("--compression", default="zstd", choices=["zstd", "snappy", "gzip", "none"])
+    args = parser.parse_args()
+
+    counts = snapshot(args.out_dir, tables=args.tables, full=args.full, workers=args.workers,
+                      compression=args.compression)
+    for name, rows in counts.items():
+        print(f"{name}: {rows} rows")
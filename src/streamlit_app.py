@@ -4,6 +4,10 @@ import streamlit as st
 import os
 import uuid
 from chat_thread import ChatThread
+from chat_view import render_chat
+from chat_writer import flush_chat_writes, chat_writer_stats
+from db_utils import flush_state
+from db import begin_run_cache, run_cache_stats, get_session_bootstrap
 import streamlit.components.v1 as components
 
 import textwrap
@@ -14,6 +18,11 @@ from study_text import study_period_phrase, reflection_invite_phrase
 restore_id = str(uuid.uuid4())
 print(f"🔄 Restore Cycle: {restore_id}")
 
+# fresh per-run read cache (repeated get_tasks/get_goals/... hit the DB once per run)
+begin_run_cache()
+# get_session_bootstrap() result; only valid for the run that loaded it
+st.session_state.pop("_bootstrap", None)
+
 st.set_page_config(page_title="SMART Goal Chatbot", layout="centered")
 
 st.markdown(
@@ -82,6 +91,9 @@ else:
     st.session_state["user_id"] = user_id  # Always sync to session state for later use
     if not isinstance(st.session_state.get("chat_thread"), ChatThread):
         st.session_state["chat_thread"] = ChatThread(user_id)
+    # anything left by a previous run that ended before the routing block
+    flush_chat_writes()
+    flush_state()
 # ---------------------------
 
 import time
@@ -90,15 +102,15 @@ from db_utils import build_goal_tasks_text, set_state
 
 from db import (
     create_user, user_completed_training, mark_training_completed,
-    save_message_to_db, get_chat_history, get_user_info,
+    save_message_to_db, get_chat_history_page,
     save_goal, save_task, save_reflection,
-    get_tasks, get_goals, user_goals_exist,
-    get_goals_with_task_counts, get_last_reflection_meta, get_reflection_responses,
-    get_session_state, save_session_state, reflection_exists
+    get_tasks, get_goals, user_goals_exist, get_goal_overview,
+    save_session_state, reflection_exists
 )
 from reflection_flow import run_weekly_reflection
 from goal_flow import run_goal_setting, run_add_tasks
 from phases import smart_training_flow
+from llama_utils import llm_stats
 from prompts import system_prompt_goal_refiner, system_prompt_reflection_summary
 from logger import setup_logger
 
@@ -117,6 +129,34 @@ if isinstance(dev_param, list):
 if dev_param == "1":
     DEV_MODE = True
 
+# How many chat messages are replayed on restore before "Load earlier messages"
+CHAT_RESTORE_PAGE_SIZE = int(os.getenv("CHAT_RESTORE_PAGE_SIZE", "30"))
+
+def load_earlier_messages():
+    """Prepend the previous page of this phase's history to the chat thread (no DB writes)."""
+    cursor = st.session_state.get("chat_history_cursor")
+    if not cursor or cursor["phase"] != st.session_state.get("chat_state"):
+        return
+    page = get_chat_history_page(
+        st.session_state["user_id"], cursor["phase"],
+        limit=CHAT_RESTORE_PAGE_SIZE, before=cursor["before"]
+    )
+    older = [
+        {
+            "sender":    "Assistant" if row["sender"] == "bot" else "User",
+            "message":   row["message"],
+            "timestamp": row["timestamp"],
+        }
+        for row in page
+    ]
+    # slice assignment goes through list, not ChatThread.append, so nothing is re-saved
+    st.session_state["chat_thread"][0:0] = older
+    st.session_state["chat_history_cursor"] = (
+        {"phase": cursor["phase"], "before": (page[0]["timestamp"], page[0]["id"])}
+        if len(page) == CHAT_RESTORE_PAGE_SIZE else None
+    )
+    st.session_state["chat_view_reset"] = True
+
 def ensure_download_content(goal_text, tasks):
     if "download_content" not in st.session_state:
         st.session_state["download_content"] = build_goal_tasks_text(goal_text, tasks)
@@ -291,6 +331,9 @@ if dev_param=="1":
     st.sidebar.json(dict(st.session_state))
     # and show whether chat_state is missing
     st.sidebar.write("🛠 chat_state missing?", "chat_state" not in st.session_state)
+    st.sidebar.write("🛠 chat writer:", chat_writer_stats())
+    st.sidebar.write("🛠 LLM:", llm_stats())
+    st.sidebar.write("🛠 DB read cache (this run):", run_cache_stats())
     if st.sidebar.button("DEV: Jump to Reflection 1-b"):
         st.session_state["chat_state"] = "reflection"
         st.session_state["week"] = 1
@@ -305,8 +348,15 @@ if st.session_state.get("authenticated") and "chat_state" not in st.session_stat
 
     user_id = st.session_state["user_id"]
 
+    # user row, saved session, goals/tasks, reflection meta and the chat page
+    # to restore, in one query (also read by the deep-link check and
+    # run_weekly_reflection later in this run)
+    boot = get_session_bootstrap(user_id, chat_limit=CHAT_RESTORE_PAGE_SIZE) or {}
+    if boot:
+        st.session_state["_bootstrap"] = boot
+
     # Check if user exists in DB
-    user_info = get_user_info(user_id)
+    user_info = boot.get("user")
     if not user_info:
         # default to control = "0"
         group = query_params.get("g", ["0"])[0]
@@ -329,7 +379,7 @@ if st.session_state.get("authenticated") and "chat_state" not in st.session_stat
 
     print("🧬 DB restore fingerprint:", st.session_state.get("RESTORED_FROM_DB", "(not restored this run)"))
 
-    saved = get_session_state(user_id) or {}
+    saved = boot.get("session_state") or {}
 
     q = st.query_params.to_dict()
     w = q.get("week", [None])[0] if isinstance(q.get("week"), list) else q.get("week")
@@ -357,9 +407,17 @@ if st.session_state.get("authenticated") and "chat_state" not in st.session_stat
         for k, v in saved.items():
             st.session_state[k] = v
 
-        # 2) Rebuild only this phase's chat history
+        # 2) Rebuild only this phase's chat history: just the latest page,
+        #    older pages are loaded on demand ("Load earlier messages")
         current_phase = st.session_state["chat_state"]
-        history = get_chat_history(user_id, current_phase)
+        if boot and current_phase == saved.get("chat_state"):
+            history = boot["chat_page"]
+        else:
+            history = get_chat_history_page(user_id, current_phase, limit=CHAT_RESTORE_PAGE_SIZE)
+        st.session_state["chat_history_cursor"] = (
+            {"phase": current_phase, "before": (history[0]["timestamp"], history[0]["id"])}
+            if len(history) == CHAT_RESTORE_PAGE_SIZE and current_phase != "view_goals" else None
+        )
 
         # 3) Create a fresh ChatThread and disable DB writes for replay
         if current_phase in ("view_goals"):
@@ -399,7 +457,7 @@ if st.session_state.get("authenticated") and "chat_state" not in st.session_stat
         st.session_state.setdefault("chat_thread", ChatThread(user_id))
 
 
-    goals = get_goals_with_task_counts(user_id)
+    goals = boot.get("goals", [])  # newest first
     # only warn if they've actually added ≥1 task
     has_any_task = any(g["task_count"] > 0 for g in goals)
     
@@ -407,7 +465,7 @@ if st.session_state.get("authenticated") and "chat_state" not in st.session_stat
         goal = goals[0]
         goal_id   = goal["id"]
         goal_text = goal["goal_text"]
-        tasks     = get_tasks(goal_id, active_only=True)
+        tasks     = boot["active_tasks"]  # active tasks of goals[0]
         
         if "download_content" not in st.session_state:
             st.session_state["download_content"] = build_goal_tasks_text(
@@ -494,7 +552,7 @@ if st.session_state.get("authenticated") and "chat_state" not in st.session_stat
             phase_key = f"reflection_{week}_{session}"
             set_state(chat_state=phase_key, needs_restore=True)
 
-        elif user_completed_training(user_id):
+        elif user_info and user_info["has_completed_training"]:
             set_state(
                 chat_state="menu", 
                 needs_restore=False
@@ -522,16 +580,14 @@ if "authenticated" not in st.session_state or not st.session_state["authenticate
 if "force_task_handled" not in st.session_state:
     st.session_state["force_task_handled"] = False
 
-goals = get_goals_with_task_counts(st.session_state["user_id"])
-
 # Only trigger when we are back at menu AND there is a goal with no tasks
 if (
     st.session_state.get("chat_state") == "menu" 
-    and goals 
     and not st.session_state.get("force_task_handled", False)
     and not st.session_state.get("needs_restore", False)):
 
-    goal_with_no_active_tasks = next((g for g in goals if g["task_count"] == 0), None)
+    # same query as run_menu below, so it's served from the run cache there
+    goal_with_no_active_tasks = get_goal_overview(st.session_state["user_id"])["goal_without_tasks"]
 
     if goal_with_no_active_tasks:
         # Prevent infinite rerun loop BEFORE rerun
@@ -540,9 +596,7 @@ if (
         st.session_state["goal_id_being_worked"] = goal_with_no_active_tasks["id"]
         st.session_state["current_goal"] = goal_with_no_active_tasks["goal_text"]
         # st.session_state["tasks_saved"] = []
-        st.session_state["tasks_saved"] = [
-            t["task_text"] for t in get_tasks(goal_with_no_active_tasks["id"], active_only=True)
-        ]
+        st.session_state["tasks_saved"] = []  # the goal has no active tasks
         st.session_state["task_entry_stage"] = "suggest"
         set_state(
             chat_state="add_tasks",
@@ -608,99 +662,18 @@ st.title("SMART Goalie")
 
 # Use pixel height for consistent layout
 chat_height_px = 480
-# EXPERIMENTAL START #
-
-previous_len = st.session_state.get("last_rendered_index", 0)
-chat_list   = st.session_state.get("chat_thread", [])
-current_len  = len(chat_list)
-
-
-# Mark which are new
-chat_bubble_html = ""
-for i, m in enumerate(st.session_state["chat_thread"]):
-    css_class = "chat-left" if m["sender"] == "Assistant" else "chat-right"
-    if i >= previous_len:
-        # This is a new message, hide initially
-        chat_bubble_html += f'<div class="{css_class} message" style="display: none;">{m["message"]}</div>'
-    else:
-        chat_bubble_html += f'<div class="{css_class}">{m["message"]}</div>'
-
-# Save current length for next render
-st.session_state["last_rendered_index"] = current_len
-
-# EXPERIMENTAL END #
 
+# Older history of a restored session is only fetched when asked for
+_cursor = st.session_state.get("chat_history_cursor")
+if _cursor and _cursor["phase"] == st.session_state.get("chat_state"):
+    if st.button("⬆️ Load earlier messages", key="load_earlier_msgs"):
+        load_earlier_messages()
+        st.rerun()
 
-# Render chat container
+# Render chat container (incremental: only bubbles added since the last
+# rerun are sent, the browser keeps the rest)
 with st.container():
-    # EXPERIMENTAL VER START #
-    components.html(f"""
-    <html>
-    <head>
-    <style>
-        body {{
-            font-family: "Segoe UI", sans-serif;
-            margin: 0;
-            padding: 0;
-            background-color: #0e1117;
-            color: #f0f0f0;
-        }}
-        .chat-wrapper {{
-            height: calc(100vh) !important;
-            overflow-y: auto;
-            padding: 10px 10px 6px !important;
-            border-radius: 10px;
-            border: 1px solid #444;
-            background-color: #1c1f26;
-            box-sizing: border-box;
-        }}
-        .chat-left {{
-            text-align: left;
-            background-color: #2b2f38;
-            color: #eaeaea;
-            border-radius: 10px;
-            padding: 10px;
-            margin: 5px 0;
-            max-width: 80%;
-            display: block;
-            word-wrap: break-word;
-        }}
-        .chat-right {{
-            text-align: right;
-            background-color: #005fcf;
-            color: #ffffff;
-            border-radius: 10px;
-            padding: 10px;
-            margin: 5px 0;
-            max-width: 80%;
-            margin-left: auto;
-            display: block;
-            word-wrap: break-word;
-        }}
-    </style>
-    </head>
-    <body>
-        <div id="chatbox" class="chat-wrapper">
-            {chat_bubble_html}
-            <div id="endofchat" style="height: 6px;"></div>
-        </div>
-        <script>
-            const chatBox = document.getElementById("chatbox");
-            const newMessages = document.querySelectorAll(".message");
-
-            function revealMessages(i) {{
-                if (i >= newMessages.length) return;
-                newMessages[i].style.display = "block";
-                chatBox.scrollTop = chatBox.scrollHeight;
-                setTimeout(() => revealMessages(i + 1), 0);
-            }}
-
-            chatBox.scrollTop = chatBox.scrollHeight;
-            revealMessages(0);
-        </script>
-    </body>
-    </html>
-    """, height=chat_height_px, scrolling=False)
+    render_chat(st.session_state.get("chat_thread", []), height=chat_height_px)
 
 # # if we've been told to show a download, render it here in the normal Streamlit UI
 # if st.session_state.get("show_download"):
@@ -711,8 +684,6 @@ with st.container():
 #         mime="text/plain",
 #     )
 
-    # EXPERIMENTAL VER END 
-
 # ────────────────────────────────────────────────────────────
 # JS “ping” to keep the WebSocket alive every 25 s
 components.html(
@@ -838,12 +809,13 @@ def run_smart_training():
 def run_menu():
     user_id = st.session_state["user_id"]
     chat_thread = st.session_state.setdefault("chat_thread", [])
+    overview = get_goal_overview(user_id)
+    goals_exist = overview["goal"] is not None
 
     # Only ever append if chat_thread is empty
     if not chat_thread:
-        if user_goals_exist(user_id):
-            goals = get_goals_with_task_counts(user_id)
-            task_count = goals[0]["task_count"]
+        if goals_exist:
+            task_count = overview["goal"]["task_count"]
             tasks_left = max(3 - task_count, 0)
             if tasks_left > 0:
                 add_line = f"You can add up to {tasks_left} more to keep the momentum going, "
@@ -868,7 +840,6 @@ def run_menu():
         st.rerun()
 
     last_msg = chat_thread[-1]
-    goals_exist = user_goals_exist(user_id)
 
     # Only append menu bubble ONCE per menu render
     if (
@@ -885,8 +856,7 @@ def run_menu():
         pass
     else:
         if goals_exist:
-            goals = get_goals_with_task_counts(user_id)
-            task_count = goals[0]["task_count"]
+            task_count = overview["goal"]["task_count"]
             tasks_left = max(3 - task_count, 0)
             if tasks_left > 0:
                 add_line = f"You can add up to {tasks_left} more to keep the momentum going, "
@@ -914,7 +884,7 @@ def run_menu():
 
     col1,col2= st.columns(2)
 
-    if not user_goals_exist(st.session_state["user_id"]):
+    if not goals_exist:
         if col1.button("➕ Create a New Goal"):
             set_state(
                 chat_state = "goal_setting",
@@ -932,7 +902,7 @@ def run_menu():
                 )
             st.rerun()
 
-    if user_completed_training(st.session_state["user_id"]):
+    if overview["has_completed_training"]:
         if col2.button("📚 Review SMART Goal Training"):
             set_state(
                 chat_state = "smart_training",
@@ -948,7 +918,9 @@ def run_view_goals():
     triggered = st.session_state.get("trigger_view_goals", False)
 
     user_id = st.session_state["user_id"]
-    goals   = get_goals_with_task_counts(user_id)
+    # goal, active tasks and last reflection's done/total in one query
+    overview = get_goal_overview(user_id)
+    goals   = overview["goal"] is not None
     if not goals:
         st.session_state["chat_thread"].append({
             "sender":"Assistant",
@@ -956,10 +928,10 @@ def run_view_goals():
         })
         # no return here — we still want to show the buttons below
     else:
-        goal      = goals[0]
+        goal      = overview["goal"]
         goal_id   = goal["id"]
         goal_text = goal["goal_text"]
-        tasks     = get_tasks(goal_id, active_only=True)
+        tasks     = goal["tasks"]
 
         if triggered:
             # only append these two bubbles ONCE, right after the button click
@@ -972,11 +944,10 @@ def run_view_goals():
 
             st.session_state["chat_thread"].append({"sender":"Assistant","message":html})
 
-            meta = get_last_reflection_meta(user_id, goal_id)
+            meta = overview["last_reflection"]
             if meta:
-                rows = get_reflection_responses(meta["id"])
-                done  = sum(1 for r in rows if r.get("task_id") and r["progress_rating"]==4)
-                total = len([r for r in rows if r.get("task_id")])
+                done  = meta["done"]
+                total = meta["total"]
                 summary = (
                     "<div class='chat-left'>"
                     f"<b>Last Reflection (Week {meta['week_number']}):</b><br>"
@@ -990,7 +961,7 @@ def run_view_goals():
     # 2) now always render the two columns of buttons
     col1, col2, col3 = st.columns([1,1,1])
     if goals and len(tasks) < 3 and col1.button("➕ Add Another Task"):
-        existing_active = [t["task_text"] for t in get_tasks(goal_id,active_only=True)]
+        existing_active = [t["task_text"] for t in tasks]
         st.session_state.update({
             "chat_state":"add_tasks",
             "goal_id_being_worked":goal_id,
@@ -1061,11 +1032,16 @@ if st.session_state.get("group") == "treatment" and w and s:
     else:
         if w in {"1", "2"} and s in {"a", "b"}:
             user_id = st.session_state["user_id"]
-            goals = get_goals(user_id)  
+            boot = st.session_state.get("_bootstrap")
+            goals = boot["goals"] if boot else get_goals(user_id)
             if goals:
                 goal_id = goals[0]["id"]
+                if boot:
+                    submitted = (int(w), s) in boot["completed_reflections"]
+                else:
+                    submitted = reflection_exists(user_id, goal_id, int(w), s)
                 # If NOT submitted yet, go to reflection
-                if not reflection_exists(user_id, goal_id, int(w), s):
+                if not submitted:
                     set_state(
                         chat_state=f"reflection_{w}_{s}",
                         week=int(w),
@@ -1085,17 +1061,22 @@ if "chat_state" not in st.session_state:
 
 state = st.session_state["chat_state"]
 
-if state == "intro":
-    run_intro()
-elif state == "smart_training":
-    run_smart_training()
-elif state == "menu":
-    run_menu()
-elif state == "goal_setting":
-    run_goal_setting()
-elif state.startswith("reflection"):
-    run_weekly_reflection()
-elif state == "view_goals":
-    run_view_goals()
-elif state == "add_tasks":
-    run_add_tasks()
\ No newline at end of file
+try:
+    if state == "intro":
+        run_intro()
+    elif state == "smart_training":
+        run_smart_training()
+    elif state == "menu":
+        run_menu()
+    elif state == "goal_setting":
+        run_goal_setting()
+    elif state.startswith("reflection"):
+        run_weekly_reflection()
+    elif state == "view_goals":
+        run_view_goals()
+    elif state == "add_tasks":
+        run_add_tasks()
+finally:
+    # st.rerun()/st.stop() raise, so this runs before every rerun
+    flush_chat_writes()
+    flush_state()
\ No newline at end of file